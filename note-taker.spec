@@ -22,10 +22,30 @@ note_taker_sources = [
     'src/audio/AudioCapture.py',
     'src/audio/textual_transcription_textarea.py',
     'src/audio/Transcriber.py',
+    'src/audio/batch_transcription.py',
+    'src/audio/block_pool.py',
+    'src/audio/mixer.py',
+    'src/audio/model_registry.py',
+    'src/audio/recorder.py',
+    'src/audio/resampler.py',
+    'src/audio/segmenter.py',
+    'src/audio/transcript_view.py',
+    'src/audio/vad.py',
+    'src/llm/batch_summarization.py',
+    'src/llm/context.py',
+    'src/llm/jobs.py',
     'src/llm/model.py',
+    'src/llm/prefix_cache.py',
+    'src/llm/server.py',
+    'src/llm/summarize.py',
+    'src/llm/summary_cache.py',
     'src/notes/manager.py',
+    'src/notes/metadata_store.py',
+    'src/notes/transcript_log.py',
     'src/utils/defaults.py',
     'src/utils/helpers.py',
+    'src/utils/metrics.py',
+    'src/utils/model_loader.py',
     'src/utils/resource_path.py',
     'src/utils/storage.py'
 ]
@@ -1,6 +1,7 @@
 import os
 import platform
 import subprocess
+import time
 from typing import Optional
 
 from rich.panel import Panel
@@ -18,6 +19,8 @@ from notes.manager import NoteManager
 from notes_editor_components import NoteEditScreen, LiveNoteEditScreen
 from settings_screen import SettingsScreen
 from utils.helpers import open_folder_with_finder
+from utils.model_loader import loaders
+from utils.storage import cache_stats
 
 
 class NotePanel(Static):
@@ -37,6 +40,22 @@ class NotePanel(Static):
         )
 
 
+class ModelStatus(Static):
+    """Shows which models are still loading, and hides once they are all ready."""
+
+    def on_mount(self):
+        self.timer = self.set_interval(0.25, self.update_status)
+        self.update_status()
+
+    def update_status(self):
+        if all(loader.future.done() for loader in loaders):
+            self.timer.stop()
+        if all(loader.ready() for loader in loaders):
+            self.display = False
+            return
+        self.update(" | ".join(f"{loader.name}: {loader.status}" for loader in loaders))
+
+
 class NoteListView(ListView):
     def __init__(self, node_select_callback: callable, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -97,6 +116,7 @@ class RichNoteTakingScreen(Screen):
 
     def compose(self):
         yield Header()
+        yield ModelStatus(id="model_status")
         yield NoteListView(self.action_edit_note, id="note_list")
         yield Footer()
 
@@ -150,5 +170,17 @@ class RichNoteTakingScreen(Screen):
 
 
 class RichNoteTakingApp(App):
+    def __init__(self, start_time: float | None = None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.start_time = start_time
+
     def on_mount(self):
         self.push_screen(RichNoteTakingScreen())
+        if self.start_time is not None:
+            self.call_after_refresh(self.log_startup_time)
+
+    def log_startup_time(self):
+        self.log.info(f"Startup took {time.perf_counter() - self.start_time:.2f}s")
+
+    def on_unmount(self):
+        self.log.info(f"Settings cache stats: {cache_stats()}")
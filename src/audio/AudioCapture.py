@@ -1,11 +1,13 @@
 import sounddevice as sd
 import numpy as np
 import threading
-import queue
-import resampy
 from textual import log
 from typing import Callable
 
+from audio.block_pool import BlockPool, BlockQueue
+from audio.mixer import AudioMixer
+from audio.resampler import StreamingResampler
+
 
 def print_audio_devices():
     log.info("Available audio devices:")
@@ -22,16 +24,21 @@ class AudioCapture:
         audio_data_callback: Callable[[np.ndarray], None],
         target_sample_rate=16000,
         block_duration=0.05,
+        buffer_duration=2.0,
     ):
         self.target_sample_rate = target_sample_rate
         self.block_duration = block_duration
+        self.buffer_duration = buffer_duration
         self.recording = False
-        self.audio_queue = queue.Queue()
+        self.audio_queue = BlockQueue()
+        self.mic_pool = None
+        self.desktop_pool = None
+        self._reported_losses = 0
         self.audio_data_callback = audio_data_callback
-        self.last_mic_data = None
-        self.last_desktop_data = None
-        self.new_mic_data = True
-        self.new_desktop_data = True
+        self.mixer = AudioMixer(
+            sample_rate=target_sample_rate,
+            frame_size=int(target_sample_rate * block_duration),
+        )
 
     def get_desktop_device(self):
         devices = sd.query_devices()
@@ -42,6 +49,9 @@ class AudioCapture:
         return sd.default.device[0]  # Default input device if no specific one found
 
     def start_recording(self):
+        # timestamps restart with the new streams, so does the mixer timeline
+        self.mixer.reset()
+        self._reported_losses = 0
         self.recording = True
 
         try:
@@ -71,6 +81,21 @@ class AudioCapture:
             )  # Use max 2 channels
             desktop_block_size = int(self.desktop_sample_rate * self.block_duration)
 
+            # Preallocated blocks the callbacks copy into, sized for buffer_duration
+            slots = max(int(self.buffer_duration / self.block_duration), 2)
+            self.mic_pool = BlockPool("mic", mic_block_size, 1, slots)
+            self.desktop_pool = BlockPool(
+                "desktop", desktop_block_size, desktop_channels, slots
+            )
+
+            # One stateful resampler per source so filter history carries over
+            self.mic_resampler = StreamingResampler(
+                self.mic_sample_rate, self.target_sample_rate, mic_block_size
+            )
+            self.desktop_resampler = StreamingResampler(
+                self.desktop_sample_rate, self.target_sample_rate, desktop_block_size
+            )
+
             self.desktop_stream = sd.InputStream(
                 samplerate=self.desktop_sample_rate,
                 blocksize=desktop_block_size,
@@ -107,17 +132,41 @@ class AudioCapture:
             self.processing_thread.join()
         log.info("Recording stopped.")
 
-    def mic_callback(self, indata, frames, time, status):
+    def queue_block(self, pool: BlockPool, indata, frames, time, status):
+        # Runs on the PortAudio thread: no logging or allocation here, problems
+        # are counted and reported from the processing thread
         if status:
-            log.info(f"Microphone stream error: {status}")
-        if self.recording:
-            self.audio_queue.put(("mic", indata.copy()))
+            pool.overflows += 1
+        if not self.recording:
+            return
+        slot = pool.write(indata, frames)
+        if slot is not None:
+            self.audio_queue.put(pool, slot, frames, time.inputBufferAdcTime)
+
+    def mic_callback(self, indata, frames, time, status):
+        self.queue_block(self.mic_pool, indata, frames, time, status)
 
     def desktop_callback(self, indata, frames, time, status):
-        if status:
-            log.info(f"Desktop stream error: {status}")
-        if self.recording:
-            self.audio_queue.put(("desktop", indata.copy()))
+        self.queue_block(self.desktop_pool, indata, frames, time, status)
+
+    def stats(self):
+        stats = {"mixer": self.mixer.stats()}
+        if self.mic_pool:
+            stats["mic"] = self.mic_pool.stats()
+        if self.desktop_pool:
+            stats["desktop"] = self.desktop_pool.stats()
+        return stats
+
+    def report_losses(self):
+        pools = [pool for pool in (self.mic_pool, self.desktop_pool) if pool]
+        losses = sum(pool.dropped + pool.overflows for pool in pools)
+        if losses != self._reported_losses:
+            self._reported_losses = losses
+            for pool in pools:
+                log.info(
+                    f"{pool.source} stream: {pool.overflows} input overflow(s), "
+                    f"{pool.dropped} block(s) dropped, {pool.in_use()}/{pool.slots} slots in use"
+                )
 
     def normalize_audio(self, audio, target_level=-3):
         """
@@ -128,71 +177,43 @@ class AudioCapture:
         gain = target_rms / (rms + 1e-9)  # Add small value to avoid division by zero
         return audio * gain
 
-    def resample(self, audio, original_sample_rate):
-        # make sure audio is 2D array with shape (channels, samples)
-        if audio.ndim == 1:
-            audio = audio.reshape(1, -1)
-        if audio.shape[0] > audio.shape[1]:
-            audio = audio.T
-
-        # If stereo, downmix to mono
-        if audio.shape[1] >= 2:
-            audio = np.mean(audio, axis=0)
-
-        resampled_audio = resampy.resample(
-            audio, original_sample_rate, self.target_sample_rate
-        )
-
-        # Normalize audio shape to (samples, 1)
-        return resampled_audio.reshape(-1, 1)
+    def resample(self, audio, resampler: StreamingResampler):
+        """
+        Resample a (samples, channels) block to the target sample rate, downmixing
+        to mono. The result is a (samples, 1) view into the resampler's buffer.
+        """
+        return resampler.process(audio).reshape(-1, 1)
 
     def process_audio(self):
         while self.recording or not self.audio_queue.empty():
-            try:
-                source, data = self.audio_queue.get(timeout=1)
-
-                # Resample to target sample rate
-                if source == "mic":
-                    data = self.resample(data, self.mic_sample_rate)
-                    self.last_mic_data = data
-                    self.new_mic_data = True
-                else:
-                    data = self.resample(data, self.desktop_sample_rate)
-                    self.last_desktop_data = data
-                    self.new_desktop_data = True
-
-                # Blend mic and desktop audio if both are available
-                if (
-                    self.last_mic_data is not None
-                    and self.last_desktop_data is not None
-                    and self.new_mic_data
-                    and self.new_desktop_data
-                ):
-                    # Normalize audio levels
-                    normalized_mic = self.last_mic_data
-                    normalized_desktop = self.last_desktop_data
-
-                    # Ensure both arrays have the same shape
-                    max_length = max(
-                        normalized_mic.shape[0], self.last_desktop_data.shape[0]
-                    )
-                    mic_padded = np.pad(
-                        normalized_mic,
-                        ((0, max_length - normalized_mic.shape[0]), (0, 0)),
-                    )
-                    desktop_padded = np.pad(
-                        normalized_desktop,
-                        ((0, max_length - normalized_desktop.shape[0]), (0, 0)),
-                    )
-
-                    # Blend the audio (you can adjust the weights as needed)
-                    blended_audio = 0.5 * mic_padded + 0.5 * desktop_padded
-
-                    if self.audio_data_callback:
-                        self.audio_data_callback(blended_audio)
-
-                    self.new_mic_data = False
-                    self.new_desktop_data = False
-
-            except queue.Empty:
+            entry = self.audio_queue.get(timeout=1)
+            if entry is None:
                 continue
+            pool, slot, frames, timestamp = entry
+
+            # Resample straight out of the pool slot, then hand it back
+            if pool is self.mic_pool:
+                data = self.resample(pool.view(slot, frames), self.mic_resampler)
+            else:
+                data = self.resample(pool.view(slot, frames), self.desktop_resampler)
+            pool.release(slot)
+
+            # Place the block on the shared timeline and emit every frame
+            # that both sources have covered
+            self.mixer.write(pool.source, data, timestamp)
+            self.emit_frames()
+            self.report_losses()
+
+        # Flush what is left once the streams have stopped
+        while self.mixer.pending():
+            self.emit_frames(force=True)
+        log.info(f"Audio capture stats: {self.stats()}")
+
+    def emit_frames(self, force=False):
+        frame = self.mixer.read(force)
+        while frame is not None:
+            if self.audio_data_callback:
+                self.audio_data_callback(frame)
+            if force:
+                break
+            frame = self.mixer.read()
@@ -1,11 +1,23 @@
+import itertools
 import threading
+import time
+from functools import partial
 from simpler_whisper.whisper import (
-    ThreadedWhisperModel,
+    AsyncWhisperModel,
     set_log_callback,
     WhisperSegment,
 )
-from utils import resource_path
-import platform
+from audio.model_registry import configured_model_name, model_cache
+from audio.segmenter import SpeechSegmenter
+from utils.metrics import LatencyTracker
+from utils.storage import fetch_data, subscribe_to_data
+from utils.defaults import (
+    default_chunk_min_duration,
+    default_chunk_max_duration,
+    default_chunk_pause_duration,
+    default_chunk_overlap,
+    default_whisper_partial_model,
+)
 from typing import Callable, List
 
 
@@ -14,43 +26,271 @@ def my_log_callback(level, message):
     pass
 
 
+set_log_callback(my_log_callback)
+
+
 class Transcriber:
-    _instance = None
-    _lock = threading.Lock()
-
-    def __new__(cls, *args, **kwargs):
-        if not cls._instance:
-            with cls._lock:
-                if not cls._instance:
-                    cls._instance = super(Transcriber, cls).__new__(cls)
-                    cls._instance._initialize(*args, **kwargs)
-        return cls._instance
-
-    def _initialize(self):
-        model_path = resource_path.resource_path("data/ggml-small.en-q5_1.bin")
-        use_gpu = not (platform.system() == "Darwin")
-        self.model = ThreadedWhisperModel(
-            model_path=model_path,
-            callback=self.handle_result,
-            use_gpu=use_gpu,
-            max_duration_sec=10.0,
-        )
-        set_log_callback(my_log_callback)
+    """
+    A transcription engine: Whisper models behind a speech segmenter.
+
+    Completed chunks are decoded by the main model. When a partial model is
+    configured, the growing open chunk is decoded by that (smaller, faster)
+    model instead, so the partial line updates quickly while the main model
+    re-decodes finished chunks in the background. Several engines can run side
+    by side, and either model can be swapped while the engine is running.
+    """
+
+    def __init__(
+        self, model_name: str | None = None, partial_model_name: str | None = None
+    ):
+        self.model_name = model_name or configured_model_name()
+        self.model = self._acquire(self.model_name)
+        self.partial_model_name = None
+        self.partial_model = None
+        missing_partial_model = None
+        if partial_model_name:
+            try:
+                self.partial_model = self._acquire(partial_model_name)
+                self.partial_model_name = partial_model_name
+            except Exception as e:
+                # e.g. offline and not downloaded yet: the main model decodes
+                # partials too until the partial model is available
+                print(f"Error loading partial model {partial_model_name}: {e}")
+                missing_partial_model = partial_model_name
         self.callback = None
+        self.running = False
+        # (model, chunk id) -> (sequence, is_partial, overlap in ms, submit time)
+        self.pending = {}
+        # guards the segmenter too; re-entrant because feeding or flushing the
+        # segmenter while holding it submits a chunk
+        self.pending_lock = threading.RLock()
+        self.sequence = itertools.count()
+        self.last_final = -1
+        self.last_partial = None
+        self.segmenter = None
+        self.swap_lock = threading.Lock()
+        self.latency = {"partial": LatencyTracker(), "final": LatencyTracker()}
+        if missing_partial_model:
+            threading.Thread(
+                target=self._load_partial_model,
+                args=(missing_partial_model,),
+                daemon=True,
+            ).start()
+
+    def _load_partial_model(self, model_name: str):
+        try:
+            self.set_partial_model(model_name)
+        except Exception as e:
+            print(f"Error loading partial model {model_name}: {e}")
+
+    def _acquire(self, model_name: str) -> AsyncWhisperModel:
+        model = model_cache.acquire(model_name)
+        model.callback = partial(self.handle_result, model)
+        return model
+
+    def _retire(self, old_model: AsyncWhisperModel | None):
+        if old_model is None:
+            return
+        if self.running:
+            # stopping finishes whatever the old model still has queued
+            old_model.stop()
+        model_cache.release(old_model)
+
+    def set_model(self, model_name: str | None):
+        """Switch the main model without interrupting the audio stream."""
+        model_name = model_name or configured_model_name()
+        with self.swap_lock:
+            if model_name == self.model_name:
+                return
+            new_model = self._acquire(model_name)
+            if self.running:
+                new_model.start()
+            with self.pending_lock:
+                old_model = self.model
+                if self.segmenter:
+                    # the open chunk belongs to the old model
+                    self.segmenter.flush()
+                self.model = new_model
+                self.model_name = model_name
+            self._retire(old_model)
+
+    def set_partial_model(self, model_name: str | None):
+        """Switch the partial model, or decode partials on the main model if None."""
+        with self.swap_lock:
+            if model_name == self.partial_model_name:
+                return
+            new_model = self._acquire(model_name) if model_name else None
+            if new_model and self.running:
+                new_model.start()
+            with self.pending_lock:
+                old_model = self.partial_model
+                self.partial_model = new_model
+                self.partial_model_name = model_name
+            self._retire(old_model)
+
+    def create_segmenter(self):
+        return SpeechSegmenter(
+            self.transcribe_chunk,
+            min_duration=fetch_data(
+                "settings.json", "chunk_min_duration", default_chunk_min_duration
+            ),
+            max_duration=fetch_data(
+                "settings.json", "chunk_max_duration", default_chunk_max_duration
+            ),
+            pause_duration=fetch_data(
+                "settings.json", "chunk_pause_duration", default_chunk_pause_duration
+            ),
+            overlap=fetch_data("settings.json", "chunk_overlap", default_chunk_overlap),
+        )
+
+    def transcribe_chunk(self, audio, is_partial: bool, overlap: float):
+        with self.pending_lock:
+            model = self.model
+            if is_partial:
+                model = self.partial_model or self.model
+                # partials are only worth decoding when the model is keeping up
+                if any(key[0] is model for key in self.pending):
+                    return
+            chunk_id = model.transcribe(audio)
+            self.pending[(model, chunk_id)] = (
+                next(self.sequence),
+                is_partial,
+                overlap * 1000,
+                time.perf_counter(),
+            )
 
     def handle_result(
-        self, chunk_id: int, text: List[WhisperSegment], is_partial: bool
+        self,
+        model: AsyncWhisperModel,
+        chunk_id: int,
+        text: List[WhisperSegment],
+        is_partial: bool,
     ):
+        with self.pending_lock:
+            request = self.pending.pop((model, chunk_id), None)
+            if request is None:
+                return
+            sequence, is_partial, overlap_ms, submitted = request
+            self.latency["partial" if is_partial else "final"].add(
+                time.perf_counter() - submitted
+            )
+            if is_partial and sequence < self.last_final:
+                # a final for later audio already arrived
+                return
+            newer_partial = None
+            if is_partial:
+                self.last_partial = (sequence, chunk_id, text, overlap_ms, submitted)
+            else:
+                self.last_final = max(self.last_final, sequence)
+                if self.last_partial and self.last_partial[0] > sequence:
+                    # the partial model is already ahead of this final, show it again
+                    # once the final has cleared the partial line
+                    newer_partial = self.last_partial
+        self._deliver(chunk_id, text, is_partial, overlap_ms, submitted)
+        if newer_partial:
+            _, partial_id, partial_text, partial_overlap, partial_submitted = (
+                newer_partial
+            )
+            self._deliver(
+                partial_id, partial_text, True, partial_overlap, partial_submitted
+            )
+
+    def _deliver(self, chunk_id, text, is_partial, overlap_ms, submitted):
+        if overlap_ms:
+            # the overlap was already transcribed at the end of the previous chunk
+            text = [segment for segment in text if segment.end > overlap_ms]
         if self.callback:
-            self.callback(chunk_id, text, is_partial)
+            self.callback(chunk_id, text, is_partial, submitted)
+
+    def latency_stats(self):
+        """End-to-end latency from chunk submission to result, per result type."""
+        return {kind: tracker.stats() for kind, tracker in self.latency.items()}
+
+    def _models(self):
+        return [model for model in (self.model, self.partial_model) if model]
 
-    def start(self, callback: Callable[[int, List[WhisperSegment], bool], None] = None):
+    def start(
+        self,
+        callback: Callable[[int, List[WhisperSegment], bool, float], None] = None,
+    ):
+        """
+        Args:
+            callback: Called with the chunk id, the segments, whether the result
+                is partial, and the time.perf_counter() at which the chunk's
+                audio was handed to the model.
+        """
         if callback:
             self.callback = callback
-        self.model.start()
+        self.segmenter = self.create_segmenter()
+        self.last_partial = None
+        for model in self._models():
+            model.start()
+        self.running = True
 
     def stop(self):
-        self.model.stop()
+        with self.swap_lock:
+            with self.pending_lock:
+                if self.segmenter:
+                    self.segmenter.flush()
+                    self.segmenter = None
+            for model in self._models():
+                model.stop()
+            self.running = False
+
+    def close(self):
+        """Stop and hand the models back to the cache."""
+        self.stop()
+        for model in self._models():
+            model_cache.release(model)
+
+    def flush(self):
+        with self.pending_lock:
+            if self.segmenter:
+                self.segmenter.flush()
 
     def queue_audio(self, audio_chunk):
-        self.model.queue_audio(audio_chunk)
+        # set_model flushes the segmenter from another thread
+        with self.pending_lock:
+            if self.segmenter:
+                self.segmenter.append(audio_chunk)
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def _in_background(setter, model_name):
+    # load the new model off the UI thread
+    threading.Thread(target=setter, args=(model_name,), daemon=True).start()
+
+
+def get_transcriber(name: str = "default", model_name: str | None = None):
+    """
+    Return the named engine, creating it on first use. The default engine
+    follows the whisper_model and whisper_partial_model settings; other engines
+    keep the model they were created with until set_model() is called.
+    """
+    with _engines_lock:
+        if name not in _engines:
+            if model_name is None:
+                engine = Transcriber(
+                    partial_model_name=fetch_data(
+                        "settings.json",
+                        "whisper_partial_model",
+                        default_whisper_partial_model,
+                    )
+                )
+                subscribe_to_data(
+                    "settings.json",
+                    "whisper_model",
+                    partial(_in_background, engine.set_model),
+                )
+                subscribe_to_data(
+                    "settings.json",
+                    "whisper_partial_model",
+                    partial(_in_background, engine.set_partial_model),
+                )
+            else:
+                engine = Transcriber(model_name)
+            _engines[name] = engine
+        return _engines[name]
@@ -0,0 +1,276 @@
+"""
+Headless transcription of recorded audio files.
+
+Each file is split at silences with SpeechSegmenter and the segments are
+transcribed in parallel by a pool of processes that each hold their own Whisper
+model. Results are stitched back together in order and written to the note's
+transcription file through NoteManager.
+"""
+
+import os
+import time
+import wave
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+try:
+    import soundfile
+except ImportError:  # optional, only needed for FLAC and Ogg files
+    soundfile = None
+
+from audio.resampler import StreamingResampler
+from audio.segmenter import SpeechSegmenter
+from notes.manager import NoteManager
+from audio.model_registry import configured_model_name, resolve_model_path
+
+SAMPLE_RATE = 16000
+BLOCK_SIZE = 800
+# read through soundfile, WAV files are read with the wave module
+COMPRESSED_EXTENSIONS = (".flac", ".ogg", ".opus")
+
+_worker_model = None
+
+
+def read_wav(path):
+    """Read a PCM WAV file as mono float32 at 16 kHz."""
+    with wave.open(path, "rb") as wav_file:
+        channels = wav_file.getnchannels()
+        sample_rate = wav_file.getframerate()
+        width = wav_file.getsampwidth()
+        frames = wav_file.readframes(wav_file.getnframes())
+    if width != 2:
+        raise ValueError(f"{path}: only 16-bit PCM is supported")
+    audio = np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768
+    audio = audio.reshape(-1, channels)
+    return _to_mono(
+        (
+            audio[start : start + sample_rate]
+            for start in range(0, len(audio), sample_rate)
+        ),
+        sample_rate,
+    )
+
+
+def read_audio(path):
+    """Read a WAV, FLAC or Ogg (Vorbis or Opus) file as mono float32 at 16 kHz."""
+    if not path.lower().endswith(COMPRESSED_EXTENSIONS):
+        return read_wav(path)
+    if soundfile is None:
+        raise ValueError(f"{path}: install soundfile to read compressed audio")
+    with soundfile.SoundFile(path) as f:
+        return _to_mono(
+            f.blocks(blocksize=f.samplerate, dtype="float32", always_2d=True),
+            f.samplerate,
+        )
+
+
+def _to_mono(blocks, sample_rate):
+    """
+    Args:
+        blocks: float32 (frames, channels) arrays of about a second each.
+
+    Returns:
+        np.ndarray: The blocks mixed down to mono at 16 kHz, as one array.
+    """
+    if sample_rate == SAMPLE_RATE:
+        mono = [block.mean(axis=1).astype(np.float32) for block in blocks]
+    else:
+        # one second at a time, the resampler's work buffers grow with the block size
+        resampler = StreamingResampler(sample_rate, SAMPLE_RATE, sample_rate)
+        mono = [resampler.process(block).copy() for block in blocks]
+    return np.concatenate(mono) if mono else np.zeros(0, dtype=np.float32)
+
+
+def split_at_silences(audio, min_duration, max_duration):
+    """
+    Returns:
+        list: (audio, overlap in seconds) tuples in playback order.
+    """
+    segments = []
+
+    def on_chunk(chunk, is_partial, overlap):
+        segments.append((chunk.copy(), overlap))
+
+    segmenter = SpeechSegmenter(
+        on_chunk,
+        min_duration=min_duration,
+        max_duration=max_duration,
+        partial_interval=0,
+    )
+    for start in range(0, len(audio), BLOCK_SIZE):
+        segmenter.append(audio[start : start + BLOCK_SIZE])
+    segmenter.flush()
+    return segments
+
+
+def collect_audio_files(paths):
+    # compressed recordings in a directory are skipped when they cannot be read
+    extensions = (".wav",) + (COMPRESSED_EXTENSIONS if soundfile else ())
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(
+                os.path.join(path, name)
+                for name in os.listdir(path)
+                if name.lower().endswith(extensions)
+            )
+        else:
+            files.append(path)
+    return files
+
+
+def _init_worker(model_path, use_gpu):
+    global _worker_model
+    from simpler_whisper.whisper import WhisperModel, set_log_callback
+
+    set_log_callback(lambda level, message: None)
+    _worker_model = WhisperModel(model_path, use_gpu=use_gpu)
+
+
+def _transcribe_segment(audio, overlap):
+    overlap_ms = overlap * 1000
+    segments = _worker_model.transcribe(audio)
+    return " ".join(
+        segment.text.strip() for segment in segments if segment.end > overlap_ms
+    ).strip()
+
+
+def note_uuid_for_file(note_manager: NoteManager, path):
+    """Reuse the note a recording belongs to, or create one named after the file."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    for suffix in ("_recording", "_transcription"):
+        if stem.endswith(suffix):
+            stem = stem[: -len(suffix)]
+    if stem in note_manager.notes:
+        return stem
+    # live recordings are named {uuid}_{timestamp}_recording
+    if stem.split("_")[0] in note_manager.notes:
+        return stem.split("_")[0]
+    return note_manager.create_note(stem, f"# Notes {stem}\n\n")
+
+
+class BatchTranscriber:
+    def __init__(
+        self,
+        model_path,
+        workers,
+        use_gpu=False,
+        min_duration=1.0,
+        max_duration=25.0,
+    ):
+        self.model_path = model_path
+        self.workers = workers
+        self.use_gpu = use_gpu
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self.note_manager = NoteManager()
+
+    def run(self, files, note_uuid=None):
+        start = time.perf_counter()
+        audio_seconds = 0.0
+        # keep the pool fed without holding every recording in memory at once
+        max_in_flight = self.workers * 4
+        in_flight = {}
+        results = {}
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.model_path, self.use_gpu),
+        ) as pool:
+            for path in files:
+                try:
+                    audio = read_audio(path)
+                except Exception as e:
+                    print(f"Error reading {path}: {e}")
+                    continue
+                audio_seconds += len(audio) / SAMPLE_RATE
+                segments = split_at_silences(
+                    audio, self.min_duration, self.max_duration
+                )
+                results[path] = [None] * len(segments)
+                print(
+                    f"{path}: {len(audio) / SAMPLE_RATE:.0f}s, {len(segments)} segments"
+                )
+                if not segments and not note_uuid:
+                    self._write(path, [])
+                for index, (segment, overlap) in enumerate(segments):
+                    while len(in_flight) >= max_in_flight:
+                        self._collect(in_flight, results, note_uuid)
+                    future = pool.submit(_transcribe_segment, segment, overlap)
+                    in_flight[future] = (path, index)
+            while in_flight:
+                self._collect(in_flight, results, note_uuid)
+
+        if note_uuid:
+            # all files go into the one note, in the order they were given
+            self._write(
+                ", ".join(files),
+                [text for path in files for text in results.get(path, [])],
+                note_uuid,
+            )
+
+        elapsed = time.perf_counter() - start
+        print(
+            f"Transcribed {len(files)} file(s), {audio_seconds / 60:.1f} min of audio "
+            f"in {elapsed:.1f}s (real-time factor {elapsed / max(audio_seconds, 1e-9):.3f})"
+        )
+
+    def _collect(self, in_flight, results, note_uuid):
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            path, index = in_flight.pop(future)
+            texts = results[path]
+            texts[index] = future.result()
+            if not note_uuid and all(text is not None for text in texts):
+                self._write(path, texts)
+                del results[path]
+
+    def _write(self, path, texts, uuid=None):
+        uuid = uuid or note_uuid_for_file(self.note_manager, path)
+        transcription = "\n".join(text for text in texts if text)
+        self.note_manager.update_note_transcription(uuid, transcription)
+        print(f"{path} -> note {uuid}")
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "paths",
+        nargs="+",
+        help="WAV files, FLAC or Ogg files if soundfile is installed, or directories",
+    )
+    parser.add_argument(
+        "--note", help="uuid of the note to write to (default: one note per file)"
+    )
+    parser.add_argument(
+        "--model",
+        help="Whisper model name or path to a ggml file (default: the whisper_model setting)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        # whisper.cpp runs up to four threads per model
+        default=max(1, (os.cpu_count() or 1) // 4),
+        help="number of Whisper processes",
+    )
+    parser.add_argument("--gpu", action="store_true")
+    parser.add_argument("--min-duration", type=float, default=1.0)
+    parser.add_argument("--max-duration", type=float, default=25.0)
+
+
+def main(args):
+    files = collect_audio_files(args.paths)
+    if not files:
+        print("No audio files found")
+        return
+    if args.note and args.note not in NoteManager().notes:
+        print(f"Note {args.note} not found")
+        return
+    BatchTranscriber(
+        resolve_model_path(args.model or configured_model_name()),
+        args.workers,
+        use_gpu=args.gpu,
+        min_duration=args.min_duration,
+        max_duration=args.max_duration,
+    ).run(files, note_uuid=args.note)
@@ -0,0 +1,110 @@
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class BlockPool:
+    """
+    Fixed set of preallocated audio blocks for one input stream.
+
+    The PortAudio callback copies indata into a free slot and hands the slot
+    index to the processing thread, which reads the block in place and releases
+    it afterwards. Nothing is allocated on the audio thread; when every slot is
+    in use the block is dropped and counted instead of growing a queue.
+    """
+
+    def __init__(self, source: str, block_size: int, channels: int, slots: int):
+        self.source = source
+        self.block_size = block_size
+        self.channels = channels
+        self.blocks = np.zeros((slots, block_size, channels), dtype=np.float32)
+        # deque append/popleft are atomic, so both threads can use it lock-free
+        self._free = deque(range(slots))
+        self.slots = slots
+
+        self.submitted = 0
+        self.dropped = 0
+        self.overflows = 0
+        self.high_water = 0
+
+    def in_use(self):
+        return self.slots - len(self._free)
+
+    def pressure(self):
+        """Fraction of slots currently waiting to be processed."""
+        return self.in_use() / self.slots
+
+    def write(self, indata: np.ndarray, frames: int):
+        """
+        Copy a callback block into a free slot.
+
+        Returns:
+            int | None: the slot index, or None if the block was dropped.
+        """
+        if frames > self.block_size:
+            self.dropped += 1
+            return None
+        try:
+            slot = self._free.popleft()
+        except IndexError:
+            self.dropped += 1
+            return None
+        np.copyto(self.blocks[slot, :frames], indata[:frames])
+        self.submitted += 1
+        in_use = self.slots - len(self._free)
+        if in_use > self.high_water:
+            self.high_water = in_use
+        return slot
+
+    def view(self, slot: int, frames: int):
+        return self.blocks[slot, :frames]
+
+    def release(self, slot: int):
+        self._free.append(slot)
+
+    def stats(self):
+        return {
+            "slots": self.slots,
+            "in_use": self.in_use(),
+            "high_water": self.high_water,
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "overflows": self.overflows,
+        }
+
+
+class BlockQueue:
+    """
+    Hands filled slots from the audio callbacks to the processing thread.
+    Entries are (pool, slot, frames, timestamp) tuples.
+    """
+
+    def __init__(self):
+        self._ready = deque()
+        self._event = threading.Event()
+
+    def put(self, pool: BlockPool, slot: int, frames: int, timestamp: float):
+        self._ready.append((pool, slot, frames, timestamp))
+        self._event.set()
+
+    def get(self, timeout: float | None = None):
+        """Return the next entry, or None if nothing arrived within timeout."""
+        try:
+            return self._ready.popleft()
+        except IndexError:
+            pass
+        # clear before checking again so a put() in between is not missed
+        self._event.clear()
+        try:
+            return self._ready.popleft()
+        except IndexError:
+            pass
+        self._event.wait(timeout)
+        try:
+            return self._ready.popleft()
+        except IndexError:
+            return None
+
+    def empty(self):
+        return not self._ready
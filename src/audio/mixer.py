@@ -0,0 +1,204 @@
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Single-producer, single-consumer ring buffer of float32 samples.
+
+    Positions are absolute sample indices on the mixer timeline. The writer only
+    advances write_pos and the reader only advances read_pos, so the two sides
+    never need a lock.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = int(capacity)
+        self.buffer = np.zeros(self.capacity, dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        self.write_pos = 0
+        self.read_pos = 0
+        self.started = False
+
+    def available(self):
+        return self.write_pos - self.read_pos
+
+    def free(self):
+        return self.capacity - (self.write_pos - self.read_pos)
+
+    def _copy_in(self, position, samples):
+        start = position % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self.buffer[start : start + first] = samples[:first]
+        if first < len(samples):
+            self.buffer[: len(samples) - first] = samples[first:]
+
+    def write(self, samples: np.ndarray):
+        self._copy_in(self.write_pos, samples)
+        self.write_pos += len(samples)
+
+    def write_silence(self, count: int):
+        start = self.write_pos % self.capacity
+        first = min(count, self.capacity - start)
+        self.buffer[start : start + first] = 0
+        if first < count:
+            self.buffer[: count - first] = 0
+        self.write_pos += count
+
+    def read_into(self, out: np.ndarray, count: int):
+        """Copy count samples from read_pos into out without advancing."""
+        start = self.read_pos % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self.buffer[start : start + first]
+        if first < count:
+            out[first:count] = self.buffer[: count - first]
+
+
+class AudioMixer:
+    """
+    Mixes the microphone and desktop streams on a common timeline.
+
+    Each source writes resampled blocks tagged with the PortAudio ADC timestamp
+    of their first sample. Blocks are placed where their timestamp says they
+    belong: small jitter is ignored, but once a source drifts more than
+    drift_tolerance away from its sample count it is re-aligned by inserting
+    silence or skipping samples. Fixed-size frames are emitted into a
+    preallocated buffer once every source has covered them, or once a source has
+    fallen more than max_latency behind the others.
+    """
+
+    def __init__(
+        self,
+        sources=("mic", "desktop"),
+        sample_rate=16000,
+        frame_size=800,
+        buffer_duration=2.0,
+        drift_tolerance=0.01,
+        max_latency=0.25,
+    ):
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self.drift_tolerance = int(drift_tolerance * sample_rate)
+        self.max_latency = int(max_latency * sample_rate)
+        self.rings = {
+            source: RingBuffer(int(buffer_duration * sample_rate)) for source in sources
+        }
+        self.gain = 1.0 / len(self.rings)
+        self.frame = np.zeros((frame_size, 1), dtype=np.float32)
+        self._scratch = np.zeros(frame_size, dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        """Start a new timeline, for the next recording session."""
+        for ring in self.rings.values():
+            ring.reset()
+        self._start_time = None
+        self.position = 0
+
+        self.frames_emitted = 0
+        self.underrun_frames = 0
+        self.overrun_frames = 0
+        self.padded_samples = {source: 0 for source in self.rings}
+        self.dropped_samples = {source: 0 for source in self.rings}
+
+    def _drop(self, source, count):
+        self.dropped_samples[source] += count
+        self.overrun_frames += -(-count // self.frame_size)
+
+    def write(self, source: str, samples: np.ndarray, timestamp: float | None = None):
+        """
+        Add a block of samples for a source. timestamp is the PortAudio
+        inputBufferAdcTime of the block; when it is missing or zero the block is
+        assumed to follow the previous one.
+        """
+        ring = self.rings[source]
+        samples = samples.reshape(-1)
+
+        if not ring.started:
+            ring.started = True
+            if self._start_time is None and timestamp:
+                self._start_time = timestamp
+            # a source joining late starts at the current read position
+            ring.write_pos = ring.read_pos = self.position
+
+        if timestamp and self._start_time is not None:
+            expected = ring.write_pos
+            actual = int(round((timestamp - self._start_time) * self.sample_rate))
+            offset = actual - expected
+            if offset > self.drift_tolerance:
+                # the device clock ran ahead or blocks went missing
+                gap = min(offset, ring.free())
+                ring.write_silence(gap)
+                self.padded_samples[source] += gap
+            elif offset < -self.drift_tolerance:
+                # overlap with what was already written, skip the duplicate part
+                skip = min(-offset, len(samples))
+                self._drop(source, skip)
+                samples = samples[skip:]
+
+        # samples the reader has already moved past are too late to mix
+        late = self.position - ring.write_pos
+        if late > 0:
+            skip = min(late, len(samples))
+            self._drop(source, skip)
+            samples = samples[skip:]
+            ring.write_pos += skip
+
+        free = ring.free()
+        if len(samples) > free:
+            self._drop(source, len(samples) - free)
+            samples = samples[:free]
+        if len(samples):
+            ring.write(samples)
+
+    def _frame_ready(self):
+        end = self.position + self.frame_size
+        active = [ring for ring in self.rings.values() if ring.started]
+        if not active:
+            return False
+        if all(ring.write_pos >= end for ring in active):
+            return True
+        furthest = max(ring.write_pos for ring in active)
+        return furthest - end >= self.max_latency
+
+    def read(self, force: bool = False):
+        """
+        Mix the next frame into self.frame.
+
+        Returns:
+            np.ndarray | None: the (frame_size, 1) frame buffer, which is reused
+            by the next call, or None if no frame is ready yet.
+        """
+        if not (force or self._frame_ready()):
+            return None
+
+        out = self.frame[:, 0]
+        out[:] = 0
+        underrun = False
+        for ring in self.rings.values():
+            count = min(max(ring.available(), 0), self.frame_size)
+            if ring.started and count < self.frame_size:
+                underrun = True
+            if count:
+                ring.read_into(self._scratch, count)
+                np.add(out[:count], self._scratch[:count], out=out[:count])
+            ring.read_pos = self.position + self.frame_size
+        out *= self.gain
+
+        self.position += self.frame_size
+        self.frames_emitted += 1
+        if underrun:
+            self.underrun_frames += 1
+        return self.frame
+
+    def pending(self):
+        return any(ring.write_pos > self.position for ring in self.rings.values())
+
+    def stats(self):
+        return {
+            "frames_emitted": self.frames_emitted,
+            "underrun_frames": self.underrun_frames,
+            "overrun_frames": self.overrun_frames,
+            "padded_samples": dict(self.padded_samples),
+            "dropped_samples": dict(self.dropped_samples),
+        }
@@ -0,0 +1,170 @@
+"""
+Resolves Whisper model names from data/models_directory.json to files on disk
+and keeps loaded models in an LRU cache bounded by their memory footprint.
+"""
+
+import hashlib
+import json
+import os
+import platform
+import threading
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+
+from simpler_whisper.whisper import AsyncWhisperModel
+
+from utils.defaults import default_whisper_model, default_whisper_cache_mb
+from utils.resource_path import resource_path
+from utils.storage import fetch_data, get_data_dir
+
+# models shipped inside the app bundle
+BUNDLED_MODELS = {
+    "ggml-model-whisper-small-en-q5_1": "data/ggml-small.en-q5_1.bin",
+}
+
+# loaded weights plus whisper.cpp compute buffers, relative to the file size
+MEMORY_OVERHEAD = 1.3
+
+
+def load_model_directory():
+    with open(resource_path("data/models_directory.json"), "r") as file:
+        models = json.load(file)["models"]
+    return {
+        model["local_folder_name"]: model
+        for model in models
+        if model["type"] == "MODEL_TYPE_TRANSCRIPTION"
+    }
+
+
+def download_model_file(url, path, sha256=None):
+    # huggingface "blob" links point at the web page, not the file
+    url = url.replace("/blob/", "/resolve/")
+    partial_path = path + ".part"
+    digest = hashlib.sha256()
+    try:
+        with urllib.request.urlopen(url) as response, open(partial_path, "wb") as file:
+            while True:
+                block = response.read(1 << 20)
+                if not block:
+                    break
+                digest.update(block)
+                file.write(block)
+    except Exception:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    if sha256 and digest.hexdigest().lower() != sha256.lower():
+        os.remove(partial_path)
+        raise ValueError(f"Checksum mismatch for {url}")
+    os.replace(partial_path, path)
+
+
+def resolve_model_path(name: str) -> str:
+    """
+    Return the path of a Whisper model file, downloading it into the user data
+    directory the first time a model is used. Plain file paths are returned as is.
+    """
+    if os.path.isfile(name):
+        return name
+    if name in BUNDLED_MODELS:
+        bundled = resource_path(BUNDLED_MODELS[name])
+        if os.path.exists(bundled):
+            return bundled
+
+    directory = load_model_directory()
+    if name not in directory:
+        raise KeyError(f"Unknown transcription model: {name}")
+    model_file = directory[name]["files"][0]
+    filename = os.path.basename(urllib.parse.urlparse(model_file["url"]).path)
+    model_dir = os.path.join(get_data_dir(), "models", name)
+    path = os.path.join(model_dir, filename)
+    if not os.path.exists(path):
+        os.makedirs(model_dir, exist_ok=True)
+        print(f"Downloading transcription model {name}")
+        download_model_file(model_file["url"], path, model_file.get("sha256"))
+    return path
+
+
+class ModelCache:
+    """
+    Loaded AsyncWhisperModel instances keyed by model name.
+
+    A model handed out by acquire() belongs to one engine until it is released;
+    a second engine asking for the same name gets its own instance. Released
+    models stay loaded for quick reuse, and the least recently used idle ones are
+    unloaded whenever the total footprint goes over max_bytes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._idle = OrderedDict()  # model -> (name, footprint), oldest first
+        self._in_use = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def footprint(self):
+        return sum(size for _, size in self._idle.values()) + sum(
+            size for _, size in self._in_use.values()
+        )
+
+    def acquire(self, name: str) -> AsyncWhisperModel:
+        with self._lock:
+            for model, (idle_name, size) in self._idle.items():
+                if idle_name == name:
+                    del self._idle[model]
+                    self._in_use[model] = (name, size)
+                    self.hits += 1
+                    return model
+            self.misses += 1
+
+        # loading is slow, do it outside the lock
+        path = resolve_model_path(name)
+        size = int(os.path.getsize(path) * MEMORY_OVERHEAD)
+        with self._lock:
+            self._evict(size)
+        model = AsyncWhisperModel(
+            model_path=path,
+            callback=None,
+            use_gpu=not (platform.system() == "Darwin"),
+        )
+        with self._lock:
+            self._in_use[model] = (name, size)
+        return model
+
+    def release(self, model: AsyncWhisperModel):
+        model.callback = None
+        with self._lock:
+            entry = self._in_use.pop(model, None)
+            if entry is None:
+                return
+            self._idle[model] = entry
+            self._evict(0)
+
+    def _evict(self, incoming: int):
+        while self._idle and self.footprint() + incoming > self.max_bytes:
+            model, _ = self._idle.popitem(last=False)
+            self.evictions += 1
+            del model
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": len(self._idle) + len(self._in_use),
+                "in_use": len(self._in_use),
+                "footprint_mb": self.footprint() / (1 << 20),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+model_cache = ModelCache(
+    int(fetch_data("settings.json", "whisper_cache_mb", default_whisper_cache_mb)) << 20
+)
+
+
+def configured_model_name():
+    return fetch_data("settings.json", "whisper_model", default_whisper_model)
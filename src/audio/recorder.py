@@ -0,0 +1,129 @@
+import threading
+import wave
+from collections import deque
+
+import numpy as np
+
+try:
+    import soundfile
+except ImportError:  # optional, only needed for compressed recordings
+    soundfile = None
+
+# format -> (file extension, soundfile format, soundfile subtype)
+RECORDING_FORMATS = {
+    "wav": ("wav", None, None),
+    "flac": ("flac", "FLAC", "PCM_16"),
+    "opus": ("ogg", "OGG", "OPUS"),
+}
+
+
+def available_format(recording_format: str) -> str:
+    """Fall back to WAV when a compressed format cannot be written here."""
+    if recording_format not in RECORDING_FORMATS:
+        print(f"Unknown recording format {recording_format}, recording WAV")
+        return "wav"
+    if recording_format != "wav" and soundfile is None:
+        print(
+            f"soundfile is not installed, recording WAV instead of {recording_format}"
+        )
+        return "wav"
+    return recording_format
+
+
+class RecordingWriter:
+    """
+    Writes the session audio to disk on its own thread.
+
+    write() only copies the block into a bounded queue, so a slow or blocked disk
+    never holds up the audio thread; when the queue is full the block is dropped
+    from the recording and counted. The writer thread wakes up every
+    batch_duration seconds and writes everything queued in one go.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        recording_format: str = "wav",
+        sample_rate: int = 16000,
+        batch_duration: float = 1.0,
+        max_queued_duration: float = 30.0,
+        block_size: int = 800,
+    ):
+        self.path = path
+        self.recording_format = recording_format
+        self.sample_rate = sample_rate
+        self.batch_duration = batch_duration
+        self._queue = deque()
+        self._max_blocks = max(1, int(max_queued_duration * sample_rate / block_size))
+        self._wake = threading.Event()
+        self._running = True
+        self._file = self._open()
+        self.written_samples = 0
+        self.dropped_blocks = 0
+        self.high_water = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _open(self):
+        _, sf_format, subtype = RECORDING_FORMATS[self.recording_format]
+        if sf_format is None:
+            wav_file = wave.open(self.path, "wb")
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.sample_rate)
+            return wav_file
+        return soundfile.SoundFile(
+            self.path,
+            "w",
+            samplerate=self.sample_rate,
+            channels=1,
+            format=sf_format,
+            subtype=subtype,
+        )
+
+    def write(self, audio: np.ndarray):
+        """Queue a block of float32 samples. Safe to call from the audio thread."""
+        if len(self._queue) >= self._max_blocks:
+            self.dropped_blocks += 1
+            return
+        # the caller reuses its buffer
+        self._queue.append(np.array(audio, dtype=np.float32).reshape(-1))
+        if len(self._queue) > self.high_water:
+            self.high_water = len(self._queue)
+
+    def _run(self):
+        while self._running:
+            self._wake.wait(self.batch_duration)
+            self._wake.clear()
+            self._write_queued()
+        self._write_queued()
+
+    def _write_queued(self):
+        blocks = []
+        while self._queue:
+            blocks.append(self._queue.popleft())
+        if not blocks:
+            return
+        audio = np.concatenate(blocks)
+        samples = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+        if isinstance(self._file, wave.Wave_write):
+            self._file.writeframes(samples.tobytes())
+        else:
+            self._file.write(samples)
+        self.written_samples += len(samples)
+
+    def close(self):
+        """Write whatever is still queued and close the file."""
+        self._running = False
+        self._wake.set()
+        self._thread.join()
+        self._file.close()
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "format": self.recording_format,
+            "seconds": self.written_samples / self.sample_rate,
+            "dropped_blocks": self.dropped_blocks,
+            "queue_high_water": self.high_water,
+        }
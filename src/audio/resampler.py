@@ -0,0 +1,152 @@
+from functools import lru_cache
+from math import gcd
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Input rates seen on most capture devices, their filters are built at import time
+COMMON_INPUT_RATES = (44100, 48000)
+DEFAULT_TARGET_RATE = 16000
+
+# Number of zero crossings of the sinc on each side of the filter center
+ZERO_CROSSINGS = 16
+KAISER_BETA = 8.6
+ROLLOFF = 0.94
+
+
+@lru_cache(maxsize=None)
+def polyphase_filter(input_rate: int, output_rate: int):
+    """
+    Build the polyphase decomposition of a Kaiser-windowed sinc low-pass filter
+    for resampling from input_rate to output_rate.
+
+    Returns:
+        tuple: (up, down, taps) where taps has shape (up, taps_per_phase) and is
+        stored time-reversed so it can be dotted directly with a window of input.
+    """
+    divisor = gcd(int(input_rate), int(output_rate))
+    up = int(output_rate) // divisor
+    down = int(input_rate) // divisor
+
+    # cutoff relative to the upsampled rate
+    cutoff = ROLLOFF * 0.5 / max(up, down)
+    taps_per_phase = int(np.ceil(2 * ZERO_CROSSINGS * max(1.0, down / up)))
+    length = taps_per_phase * up
+    n = np.arange(length) - (length - 1) / 2.0
+    prototype = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, KAISER_BETA)
+    # unity DC gain for every phase once interpolated
+    prototype *= up / prototype.sum()
+
+    taps = prototype.reshape(taps_per_phase, up).T[:, ::-1]
+    taps = np.ascontiguousarray(taps, dtype=np.float32)
+    taps.setflags(write=False)
+    return up, down, taps
+
+
+for _rate in COMMON_INPUT_RATES:
+    polyphase_filter(_rate, DEFAULT_TARGET_RATE)
+
+
+class StreamingResampler:
+    """
+    Stateful polyphase resampler for a single audio source.
+
+    Filter history and the fractional output phase are carried from one block
+    to the next, so consecutive blocks resample exactly like one long signal.
+    All work buffers are preallocated and reused; process() returns a view into
+    an internal buffer that is only valid until the next call.
+    """
+
+    def __init__(
+        self,
+        input_rate: int,
+        output_rate: int = DEFAULT_TARGET_RATE,
+        block_size: int = 0,
+    ):
+        self.input_rate = int(input_rate)
+        self.output_rate = int(output_rate)
+        self.up, self.down, self.taps = polyphase_filter(
+            self.input_rate, self.output_rate
+        )
+        self.taps_per_phase = self.taps.shape[1]
+        self.history_size = self.taps_per_phase - 1
+        # position of the next output sample in the upsampled domain,
+        # relative to the first sample of the next block
+        self._time = 0
+        self._capacity = 0
+        self._allocate(max(int(block_size), 1))
+
+    def _allocate(self, block_size: int):
+        history = None
+        if self._capacity:
+            history = self._buffer[: self.history_size].copy()
+        self._capacity = block_size
+        max_out = (block_size * self.up) // self.down + 2
+        self._buffer = np.zeros(self.history_size + block_size, dtype=np.float32)
+        if history is not None:
+            self._buffer[: self.history_size] = history
+        self._positions = np.arange(max_out, dtype=np.int64) * self.down
+        self._time_index = np.empty(max_out, dtype=np.int64)
+        self._input_index = np.empty(max_out, dtype=np.int64)
+        self._phase_index = np.empty(max_out, dtype=np.int64)
+        self._windows = np.empty((max_out, self.taps_per_phase), dtype=np.float32)
+        self._coefficients = np.empty((max_out, self.taps_per_phase), dtype=np.float32)
+        self._output = np.empty(max_out, dtype=np.float32)
+
+    def reset(self):
+        self._buffer[:] = 0
+        self._time = 0
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """
+        Resample one block of audio. Multi-channel input of shape
+        (samples, channels) is downmixed to mono.
+
+        Returns:
+            np.ndarray: 1D float32 view of the resampled samples.
+        """
+        frames = block.shape[0]
+        if frames > self._capacity:
+            self._allocate(frames)
+
+        history = self.history_size
+        buffer = self._buffer[: history + frames]
+        # the new block lands right after the carried filter history
+        if block.ndim == 2 and block.shape[1] > 1:
+            np.mean(block, axis=1, out=buffer[history:])
+        else:
+            buffer[history:] = block.reshape(-1)
+
+        span = frames * self.up
+        count = 0
+        if self._time < span:
+            count = (span - 1 - self._time) // self.down + 1
+        if count:
+            times = self._time_index[:count]
+            np.add(self._positions[:count], self._time, out=times)
+            np.floor_divide(times, self.up, out=self._input_index[:count])
+            np.remainder(times, self.up, out=self._phase_index[:count])
+
+            windows = sliding_window_view(buffer, self.taps_per_phase)
+            np.take(
+                windows, self._input_index[:count], axis=0, out=self._windows[:count]
+            )
+            np.take(
+                self.taps,
+                self._phase_index[:count],
+                axis=0,
+                out=self._coefficients[:count],
+            )
+            np.einsum(
+                "ij,ij->i",
+                self._windows[:count],
+                self._coefficients[:count],
+                out=self._output[:count],
+            )
+
+        self._time += count * self.down - span
+
+        # keep the tail as history for the next block
+        if history:
+            buffer[:history] = buffer[frames : frames + history]
+        return self._output[:count]
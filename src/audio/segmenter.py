@@ -0,0 +1,151 @@
+from typing import Callable
+
+import numpy as np
+
+from audio.vad import EnergyVAD
+
+
+class SpeechSegmenter:
+    """
+    Groups streaming 16 kHz audio into chunks for Whisper, cutting at pauses.
+
+    Audio is analysed in short hops. Once a chunk is at least min_duration long
+    it is closed at the first pause of pause_duration. If no pause shows up
+    before max_duration the chunk is forced closed at the quietest hop near the
+    end, and the next chunk starts overlap seconds before that cut so the word
+    at the boundary is decoded with some context. Open chunks are also emitted
+    as partials every partial_interval seconds of new audio.
+
+    on_chunk is called with (audio, is_partial, overlap), where audio is a view
+    into the segmenter buffer that is only valid during the call and overlap is
+    the number of seconds at the start of audio already sent in the previous
+    chunk.
+    """
+
+    def __init__(
+        self,
+        on_chunk: Callable[[np.ndarray, bool, float], None],
+        sample_rate=16000,
+        min_duration=1.0,
+        max_duration=10.0,
+        pause_duration=0.3,
+        overlap=0.2,
+        partial_interval=1.0,
+        hop_duration=0.02,
+        detector: EnergyVAD | None = None,
+    ):
+        self.on_chunk = on_chunk
+        self.sample_rate = sample_rate
+        self.hop = int(hop_duration * sample_rate)
+        self.min_samples = int(min_duration * sample_rate)
+        self.max_samples = max(int(max_duration * sample_rate), self.min_samples)
+        self.pause_hops = max(int(pause_duration / hop_duration), 1)
+        self.overlap_samples = min(int(overlap * sample_rate), self.max_samples // 4)
+        self.partial_samples = (
+            int(partial_interval * sample_rate) if partial_interval else 0
+        )
+        # quietest point for a forced cut is searched in the last quarter
+        self.search_hops = max(self.max_samples // self.hop // 4, 1)
+        self.detector = detector or EnergyVAD()
+
+        self.buffer = np.zeros(self.max_samples + self.hop, dtype=np.float32)
+        self.energy = np.zeros(self.buffer.shape[0] // self.hop + 1, dtype=np.float32)
+        self.length = 0
+        self._analysed_hops = 0
+        self._speech_hops = 0
+        self._silent_run = 0
+        self._chunk_overlap = 0
+        self._last_partial = 0
+
+        self.chunks = 0
+        self.forced_cuts = 0
+        self.partials = 0
+
+    def append(self, audio: np.ndarray):
+        audio = audio.reshape(-1)
+        while len(audio):
+            space = self.buffer.shape[0] - self.length
+            take = min(space, len(audio))
+            self.buffer[self.length : self.length + take] = audio[:take]
+            self.length += take
+            audio = audio[take:]
+            self._analyse()
+            self._cut()
+
+    def _analyse(self):
+        while (self._analysed_hops + 1) * self.hop <= self.length:
+            start = self._analysed_hops * self.hop
+            hop = self.buffer[start : start + self.hop]
+            self.energy[self._analysed_hops] = np.dot(hop, hop)
+            if self.detector.is_speech(hop):
+                self._speech_hops += 1
+                self._silent_run = 0
+            else:
+                self._silent_run += 1
+            self._analysed_hops += 1
+
+    def _cut(self):
+        if not self._speech_hops and self._silent_run >= 2 * self.pause_hops:
+            # no speech yet, only keep a pause worth of lead-in
+            self._restart(self.length - self.pause_hops * self.hop, 0)
+        elif (
+            self._silent_run >= self.pause_hops
+            and self.length >= self.min_samples
+            and self._speech_hops
+        ):
+            self._emit(self.length)
+        elif self.length >= self.max_samples:
+            if not self._speech_hops:
+                # nothing but silence, keep only what a following word might need
+                self._restart(self.length - self.overlap_samples, 0)
+                return
+            self.forced_cuts += 1
+            first = max(self._analysed_hops - self.search_hops, 1)
+            quietest = first + int(np.argmin(self.energy[first : self._analysed_hops]))
+            cut = quietest * self.hop
+            self._emit(cut, keep_from=max(cut - self.overlap_samples, 0))
+        elif (
+            self.partial_samples
+            and self._speech_hops
+            and self.length - self._last_partial >= self.partial_samples
+        ):
+            self._last_partial = self.length
+            self.partials += 1
+            self.on_chunk(self.buffer[: self.length], True, self._overlap_seconds())
+
+    def _overlap_seconds(self):
+        return self._chunk_overlap / self.sample_rate
+
+    def _emit(self, end: int, keep_from: int | None = None):
+        self.chunks += 1
+        self.on_chunk(self.buffer[:end], False, self._overlap_seconds())
+        if keep_from is None:
+            self._restart(end, 0)
+        else:
+            self._restart(keep_from, end - keep_from)
+
+    def _restart(self, keep_from: int, overlap: int):
+        """Drop everything before keep_from and re-analyse what is left."""
+        remaining = self.length - keep_from
+        self.buffer[:remaining] = self.buffer[keep_from : self.length]
+        self.length = remaining
+        self._chunk_overlap = overlap
+        self._analysed_hops = 0
+        self._speech_hops = 0
+        self._silent_run = 0
+        self._last_partial = 0
+        self._analyse()
+
+    def flush(self):
+        """Close the open chunk, typically because the speaker stopped."""
+        if self._speech_hops:
+            self._emit(self.length)
+        else:
+            self._restart(self.length, 0)
+
+    def stats(self):
+        return {
+            "chunks": self.chunks,
+            "forced_cuts": self.forced_cuts,
+            "partials": self.partials,
+        }
@@ -1,129 +1,182 @@
-from os import path
-from queue import Queue
+import threading
 import time
-from typing import List
+from functools import partial
+from typing import List, TYPE_CHECKING
 import numpy as np
-from textual.widgets import TextArea
 from textual import on, work
 from textual.message import Message
 from textual.worker import get_current_worker
-import wave
 
-from audio.Transcriber import Transcriber
 from audio.AudioCapture import AudioCapture
+from audio.recorder import RECORDING_FORMATS, RecordingWriter, available_format
+from audio.transcript_view import TranscriptView
+from audio.vad import VadGate
 from notes.manager import NoteManager
+from utils.defaults import default_recording_format, default_transcript_frame_rate
+from utils.metrics import LatencyTracker
+from utils.model_loader import transcriber_loader
+from utils.storage import fetch_data
 
-from simpler_whisper.whisper import WhisperSegment
+if TYPE_CHECKING:
+    from simpler_whisper.whisper import WhisperSegment
 
 
-class TranscriptionTextArea(TextArea):
+class TranscriptionTextArea(TranscriptView):
     def __init__(self, uuid: str, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.transcriptions: List[str] = []
-        self.partial_transcription = ""
-        self.update_queue = Queue()
+        # results not yet on screen are merged into the one Update in flight
+        self.pending_update = None
+        self.update_lock = threading.Lock()
+        frame_rate = fetch_data(
+            "settings.json", "transcript_frame_rate", default_transcript_frame_rate
+        )
+        # at least one frame a second, a rate of 0 or less would never redraw
+        self.frame_interval = 1 / max(frame_rate, 1)
+        self.last_frame = 0.0
+        self.screen_latency = LatencyTracker()
         self.is_transcribing = False
-        self.wav_file = None
+        self.recorder = None
         self.uuid = uuid
-        self.transcriber = Transcriber()
+        self.transcriber = None
         self.audio_capture = None
-        self.read_only = True
-        self.text = "Transcription will appear here."
+        self.vad_gate = None
+        self.transcript_log = None
         self.note_manager = NoteManager()
         self.start_transcription()
 
     def on_unmount(self):
         self.stop_transcription()
 
-    def generate_transcription_content(self):
-        # Combine full transcriptions and partial transcription
-        all_content = self.transcriptions + [f"\n\n(p) {self.partial_transcription}\n"]
-
-        # Join the visible content into a single string
-        content = "\n".join(all_content)
-
-        return content
-
     def process_transcription(
-        self, chunk_id: int, transcription: List[WhisperSegment], is_partial: bool
+        self,
+        chunk_id: int,
+        transcription: List["WhisperSegment"],
+        is_partial: bool,
+        submitted: float,
     ):
         if not transcription or len(transcription) == 0:
             return
         transcription_str = " ".join([segment.text for segment in transcription])
-        if is_partial:
-            self.partial_transcription = transcription_str
-        else:
-            self.partial_transcription = ""
-            self.transcriptions.append(transcription_str)
-        self.update_queue.put(True)  # Signal that an update is available
-
-    def update_transcriptions(self):
-        updated = False
-        while not self.update_queue.empty():
-            self.update_queue.get()
-            updated = True
-        return updated
+        if self.transcript_log:
+            self.transcript_log.append(
+                chunk_id,
+                transcription_str,
+                transcription[0].start,
+                transcription[-1].end,
+                is_partial,
+            )
+        with self.update_lock:
+            update = self.pending_update
+            if update is None:
+                update = self.pending_update = self.Update()
+                post = True
+            else:
+                post = False
+            if is_partial:
+                update.partial = transcription_str
+            else:
+                update.segments.append(transcription_str)
+                update.partial = ""
+            update.submitted.append(submitted)
+        if post:
+            self.post_message(update)
 
     def send_audio_to_transcriber(self, audio_data: np.ndarray):
-        self.transcriber.queue_audio(audio_data)
-        if self.wav_file is not None:
-            audio_data_int = (audio_data * 32767).astype(np.int16)
-            self.wav_file.writeframes(audio_data_int.tobytes())
+        # only speech reaches Whisper, the recording keeps everything
+        self.vad_gate.process(audio_data)
+        if self.recorder is not None:
+            self.recorder.write(audio_data)
 
     class Update(Message):
-        def __init__(self, transcription: str):
-            self.transcription = transcription
+        """The transcription results that arrived since the last frame."""
+
+        def __init__(self):
+            self.segments: List[str] = []
+            self.partial: str | None = None
+            self.submitted: List[float] = []
             super().__init__()
 
     @on(Update)
     def update_ui(self, update: Update):
-        self.text = update.transcription
-        # write the transcription to the note
-        self.note_manager.update_note_transcription(self.uuid, self.text)
-        # set the cursor to the last line
-        self.cursor_location = (len(self.text.split("\n")) + 1, 0)
+        # cap the frame rate, anything arriving meanwhile joins this update
+        wait = self.last_frame + self.frame_interval - time.perf_counter()
+        if wait > 0:
+            self.set_timer(wait, partial(self.render_update, update))
+        else:
+            self.render_update(update)
+
+    def render_update(self, update: Update):
+        with self.update_lock:
+            if self.pending_update is update:
+                self.pending_update = None
+        self.last_frame = time.perf_counter()
+        self.apply_delta(update.segments, update.partial)
+        self.call_after_refresh(self.record_screen_latency, update.submitted)
+
+    def record_screen_latency(self, submitted: List[float]):
+        now = time.perf_counter()
+        for submit_time in submitted:
+            self.screen_latency.add(now - submit_time)
 
     @work(thread=True)
     def start_transcription(self):
+        if not transcriber_loader.ready():
+            self.app.notify("Transcription will start once the model has loaded.")
+        try:
+            transcriber = transcriber_loader.get()
+        except Exception as e:
+            self.app.notify(f"Error loading transcription: {e}", severity="error")
+            return
+        if get_current_worker().is_cancelled:
+            # the note was closed while the model was loading
+            return
+        self.transcriber = transcriber
         self.app.notify("Starting transcription.")
-        self.wav_file = wave.open(
-            path.join(
-                self.note_manager.get_notes_directory(), "streaming_recording.wav"
+        recording_format = available_format(
+            fetch_data("settings.json", "recording_format", default_recording_format)
+        )
+        self.recorder = RecordingWriter(
+            self.note_manager.get_recording_path(
+                self.uuid, RECORDING_FORMATS[recording_format][0]
             ),
-            "wb",
+            recording_format,
         )
-        self.wav_file.setnchannels(1)
-        self.wav_file.setsampwidth(2)
-        self.wav_file.setframerate(16000)
 
+        self.vad_gate = VadGate(
+            self.transcriber.queue_audio, on_speech_end=self.transcriber.flush
+        )
         self.audio_capture = AudioCapture(self.send_audio_to_transcriber)
+        # results are appended as they arrive and compacted into the note's
+        # transcription file when the session ends
+        self.transcript_log = self.note_manager.open_transcript_log(self.uuid)
 
         self.transcriber.start(self.process_transcription)
         self.audio_capture.start_recording()
         self.is_transcribing = True
 
-        worker = get_current_worker()
-
-        while self.is_transcribing and not worker.is_cancelled:
-            if self.update_transcriptions():
-                self.post_message(self.Update(self.generate_transcription_content()))
-            # sleep for a short time to avoid busy loop
-            time.sleep(0.1)
-
-        self.log.info("Transcription thread end.")
-        self.app.notify("Transcription thread end.")
-
     def stop_transcription(self):
         self.app.notify("Stopping transcription.")
         self.is_transcribing = False
-        if self.transcriber:
-            self.transcriber.stop()
-            self.transcriber = None
+        # the capture flushes its last frames through the gate, and a session
+        # that ends mid-utterance is closed like a pause, before Whisper stops
         if self.audio_capture:
             self.audio_capture.stop_recording()
             self.audio_capture = None
-        if self.wav_file:
-            self.wav_file.close()
-            self.wav_file = None
+        if self.vad_gate:
+            self.vad_gate.end_speech()
+            self.log.info(f"Voice activity stats: {self.vad_gate.stats()}")
+            self.vad_gate = None
+        if self.transcriber:
+            self.transcriber.stop()
+            self.log.info(f"Transcription latency: {self.transcriber.latency_stats()}")
+            self.log.info(f"Audio to screen latency: {self.screen_latency.stats()}")
+            self.transcriber = None
+        if self.transcript_log:
+            self.note_manager.close_transcript_log(self.uuid, self.transcript_log)
+            self.transcript_log = None
+        if self.recorder:
+            self.recorder.close()
+            self.log.info(f"Recording stats: {self.recorder.stats()}")
+            self.recorder = None
         self.app.notify("Transcription stopped.")
         self.app.workers.cancel_all()
@@ -0,0 +1,66 @@
+from typing import List
+
+from textual.widgets import TextArea
+
+
+class TranscriptView(TextArea):
+    """
+    Read-only transcript display that is updated in place.
+
+    Committed segments are only ever appended at the end of the committed
+    region and the partial line below them is replaced on its own, so an update
+    costs the size of the change rather than the size of the transcript.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.transcriptions: List[str] = []
+        self.partial_transcription = ""
+        self.read_only = True
+        self.text = "Transcription will appear here."
+        self._rendered_count = 0
+        self._rendered_partial = None
+        self._committed_end = None
+
+    def apply_delta(self, segments: List[str], partial: str | None = None):
+        """
+        Args:
+            segments: Newly committed segments, in order.
+            partial: The new partial line, or None to keep the current one.
+        """
+        self.transcriptions.extend(segments)
+        if partial is not None:
+            self.partial_transcription = partial
+        self.render_updates()
+
+    def render_updates(self):
+        if self._committed_end is None:
+            # first update, clear the placeholder
+            self.text = ""
+            self._committed_end = (0, 0)
+
+        new_segments = self.transcriptions[self._rendered_count :]
+        if new_segments:
+            text = "\n".join(new_segments)
+            if self._rendered_count:
+                text = "\n" + text
+            result = self.insert(
+                text, self._committed_end, maintain_selection_offset=False
+            )
+            self._committed_end = result.end_location
+            self._rendered_count += len(new_segments)
+            # the partial line moved down, rewrite it below the new text
+            self._rendered_partial = None
+
+        partial = self.partial_transcription
+        if partial != self._rendered_partial:
+            self.replace(
+                f"\n\n\n(p) {partial}\n",
+                self._committed_end,
+                self.document.end,
+                maintain_selection_offset=False,
+            )
+            self._rendered_partial = partial
+
+        # keep the latest line in view
+        self.cursor_location = (self.document.line_count - 1, 0)
@@ -0,0 +1,185 @@
+from typing import Callable
+
+import numpy as np
+
+
+class VoiceActivityDetector:
+    """
+    Base class for frame-level voice activity detectors.
+
+    Subclass and implement is_speech() to plug in a model-based detector, the
+    gate only ever calls is_speech() and reset().
+    """
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        raise NotImplementedError
+
+    def reset(self):
+        pass
+
+
+class EnergyVAD(VoiceActivityDetector):
+    """
+    Energy and zero-crossing rate detector with an adaptive noise floor.
+
+    A frame is speech when its RMS energy is well above the tracked noise floor.
+    Frames that only just clear the threshold also need a zero-crossing rate
+    typical of voiced speech, which rejects hiss and fan noise.
+    """
+
+    def __init__(
+        self,
+        threshold_ratio=3.0,
+        min_energy=0.002,
+        max_zero_crossing_rate=0.35,
+        floor_adaptation=0.05,
+    ):
+        self.threshold_ratio = threshold_ratio
+        self.min_energy = min_energy
+        self.max_zero_crossing_rate = max_zero_crossing_rate
+        self.floor_adaptation = floor_adaptation
+        self.noise_floor = min_energy
+        self._signs = np.zeros(0, dtype=bool)
+        self._crossings = np.zeros(0, dtype=bool)
+
+    def reset(self):
+        self.noise_floor = self.min_energy
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        size = len(frame)
+        if size < 2:
+            return False
+        if len(self._signs) != size:
+            self._signs = np.zeros(size, dtype=bool)
+            self._crossings = np.zeros(size - 1, dtype=bool)
+
+        energy = float(np.sqrt(np.dot(frame, frame) / size))
+        np.signbit(frame, out=self._signs)
+        np.not_equal(self._signs[1:], self._signs[:-1], out=self._crossings)
+        zero_crossing_rate = np.count_nonzero(self._crossings) / (size - 1)
+
+        threshold = max(self.min_energy, self.noise_floor * self.threshold_ratio)
+        speech = energy > threshold and (
+            zero_crossing_rate < self.max_zero_crossing_rate or energy > 2 * threshold
+        )
+        if not speech:
+            # only follow the floor on non-speech frames so talking does not raise it
+            self.noise_floor += self.floor_adaptation * (energy - self.noise_floor)
+            self.noise_floor = max(self.noise_floor, self.min_energy / 2)
+        return speech
+
+
+class VadGate:
+    """
+    Sits between AudioCapture and the Transcriber and only forwards speech.
+
+    A short pre-roll of audio before speech onset and a hangover after it are
+    kept so word edges are not clipped. Silence in between utterances is
+    replaced by a fixed, short pad, and when speech ends the gate flushes the
+    hangover plus that pad and calls on_speech_end.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[np.ndarray], None],
+        detector: VoiceActivityDetector | None = None,
+        on_speech_end: Callable[[], None] | None = None,
+        sample_rate=16000,
+        frame_size=800,
+        pre_roll=0.3,
+        hangover=0.5,
+        silence_padding=0.2,
+    ):
+        self.sink = sink
+        self.detector = detector or EnergyVAD()
+        self.on_speech_end = on_speech_end
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self.hangover_frames = max(int(hangover * sample_rate / frame_size), 1)
+        self.silence_padding = np.zeros(int(silence_padding * sample_rate), np.float32)
+
+        pre_roll_frames = max(int(pre_roll * sample_rate / frame_size), 1)
+        self._pre_roll = np.zeros((pre_roll_frames, frame_size), dtype=np.float32)
+        self._pre_roll_start = 0
+        self._pre_roll_count = 0
+
+        self.in_speech = False
+        self._silent_frames = 0
+
+        self.speech_samples = 0
+        self.silence_samples = 0
+        self.forwarded_samples = 0
+        self.dropped_samples = 0
+        self.utterances = 0
+
+    def _remember(self, frame: np.ndarray):
+        slots = len(self._pre_roll)
+        index = (self._pre_roll_start + self._pre_roll_count) % slots
+        if self._pre_roll_count == slots:
+            # the oldest pre-roll frame falls out and is dropped for good
+            self._pre_roll_start = (self._pre_roll_start + 1) % slots
+            self.dropped_samples += self.frame_size
+        else:
+            self._pre_roll_count += 1
+        self._pre_roll[index] = frame
+
+    def _forward(self, audio: np.ndarray):
+        self.forwarded_samples += len(audio)
+        self.sink(audio)
+
+    def _flush_pre_roll(self):
+        slots = len(self._pre_roll)
+        for i in range(self._pre_roll_count):
+            self._forward(self._pre_roll[(self._pre_roll_start + i) % slots])
+        self._pre_roll_start = 0
+        self._pre_roll_count = 0
+
+    def process(self, audio: np.ndarray):
+        frame = audio.reshape(-1)
+        if len(frame) != self.frame_size:
+            # odd-sized blocks bypass the gate rather than being mis-classified
+            self._forward(frame)
+            return
+
+        speech = self.detector.is_speech(frame)
+        if speech:
+            self.speech_samples += len(frame)
+        else:
+            self.silence_samples += len(frame)
+
+        if speech:
+            if not self.in_speech:
+                self.in_speech = True
+                self.utterances += 1
+                self._flush_pre_roll()
+            self._silent_frames = 0
+            self._forward(frame)
+        elif self.in_speech:
+            self._silent_frames += 1
+            self._forward(frame)
+            if self._silent_frames >= self.hangover_frames:
+                self.end_speech()
+        else:
+            self._remember(frame)
+
+    def end_speech(self):
+        """Close the current utterance and flush it downstream."""
+        if not self.in_speech:
+            return
+        self.in_speech = False
+        self._silent_frames = 0
+        if len(self.silence_padding):
+            self._forward(self.silence_padding)
+        if self.on_speech_end:
+            self.on_speech_end()
+
+    def stats(self):
+        total = self.speech_samples + self.silence_samples
+        return {
+            "speech_seconds": self.speech_samples / self.sample_rate,
+            "silence_seconds": self.silence_samples / self.sample_rate,
+            "speech_ratio": self.speech_samples / total if total else 0.0,
+            "forwarded_ratio": self.forwarded_samples / total if total else 0.0,
+            "dropped_seconds": self.dropped_samples / self.sample_rate,
+            "utterances": self.utterances,
+        }
@@ -0,0 +1,161 @@
+"""
+Replay WAV files through different Whisper chunking policies and report the
+real-time factor and word error rate of each.
+
+A reference transcript is read from a .txt file next to each WAV file.
+Run from the src directory:
+    python -m benchmarks.chunking_benchmark --model ../data/ggml-small.en-q5_1.bin \\
+        recordings/*.wav --policy fixed:10 --policy pause:1:10:0.3:0.2
+"""
+
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+
+from audio.batch_transcription import collect_audio_files, read_audio
+from audio.segmenter import SpeechSegmenter
+
+SAMPLE_RATE = 16000
+BLOCK_SIZE = 800
+
+
+def normalize_words(text):
+    return re.sub(r"[^a-z0-9' ]+", " ", text.lower()).split()
+
+
+def word_errors(reference, hypothesis):
+    """Word-level edit distance between two word lists."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            )
+        previous = current
+    return previous[-1]
+
+
+def parse_policy(spec):
+    """
+    fixed:<seconds> cuts every N seconds like the old ThreadedWhisperModel window,
+    pause:<min>:<max>[:<pause>[:<overlap>]] uses SpeechSegmenter.
+    """
+    kind, *values = spec.split(":")
+    values = [float(value) for value in values]
+    if kind == "fixed" and len(values) == 1:
+        return {"name": spec, "kind": "fixed", "max_duration": values[0]}
+    if kind == "pause" and 2 <= len(values) <= 4:
+        keys = ["min_duration", "max_duration", "pause_duration", "overlap"]
+        return {"name": spec, "kind": "pause", **dict(zip(keys, values))}
+    raise argparse.ArgumentTypeError(f"invalid policy: {spec}")
+
+
+def replay(audio, policy, on_chunk, partial_interval):
+    if policy["kind"] == "fixed":
+        window = int(policy["max_duration"] * SAMPLE_RATE)
+        step = int(partial_interval * SAMPLE_RATE) if partial_interval else 0
+        start = 0
+        last_partial = 0
+        for end in range(BLOCK_SIZE, len(audio) + BLOCK_SIZE, BLOCK_SIZE):
+            end = min(end, len(audio))
+            if end - start >= window:
+                on_chunk(audio[start:end], False, 0.0)
+                start = last_partial = end
+            elif step and end - last_partial >= step:
+                last_partial = end
+                on_chunk(audio[start:end], True, 0.0)
+        if start < len(audio):
+            on_chunk(audio[start:], False, 0.0)
+        return
+
+    options = {k: v for k, v in policy.items() if k not in ("name", "kind")}
+    segmenter = SpeechSegmenter(on_chunk, partial_interval=partial_interval, **options)
+    for start in range(0, len(audio), BLOCK_SIZE):
+        segmenter.append(audio[start : start + BLOCK_SIZE])
+    segmenter.flush()
+
+
+def run_policy(model, files, policy, partial_interval):
+    audio_seconds = 0.0
+    decode_seconds = 0.0
+    errors = 0
+    reference_words = 0
+    chunks = 0
+
+    for path in files:
+        audio = read_audio(path)
+        audio_seconds += len(audio) / SAMPLE_RATE
+        finals = []
+
+        def on_chunk(chunk, is_partial, overlap):
+            nonlocal decode_seconds, chunks
+            start = time.perf_counter()
+            segments = model.transcribe(chunk)
+            decode_seconds += time.perf_counter() - start
+            if is_partial:
+                return
+            chunks += 1
+            overlap_ms = overlap * 1000
+            finals.extend(
+                segment.text for segment in segments if segment.end > overlap_ms
+            )
+
+        replay(audio, policy, on_chunk, partial_interval)
+
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(reference_path):
+            with open(reference_path, "r") as f:
+                reference = normalize_words(f.read())
+            errors += word_errors(reference, normalize_words(" ".join(finals)))
+            reference_words += len(reference)
+
+    return {
+        "policy": policy["name"],
+        "chunks": chunks,
+        "rtf": decode_seconds / audio_seconds if audio_seconds else float("nan"),
+        "wer": errors / reference_words if reference_words else float("nan"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="WAV files or directories")
+    parser.add_argument("--model", required=True, help="path to a ggml Whisper model")
+    parser.add_argument(
+        "--policy",
+        action="append",
+        type=parse_policy,
+        help="chunk policy, can be repeated (default: fixed:10 and pause:1:10)",
+    )
+    parser.add_argument(
+        "--partial-interval",
+        type=float,
+        default=1.0,
+        help="seconds between partial re-decodes, 0 to disable",
+    )
+    parser.add_argument("--gpu", action="store_true")
+    args = parser.parse_args()
+
+    from simpler_whisper.whisper import WhisperModel
+
+    model = WhisperModel(args.model, use_gpu=args.gpu)
+    files = collect_audio_files(args.paths)
+    policies = args.policy or [parse_policy("fixed:10"), parse_policy("pause:1:10")]
+
+    print(f"{'policy':<24} {'chunks':>7} {'RTF':>7} {'WER':>7}")
+    for policy in policies:
+        result = run_policy(model, files, policy, args.partial_interval)
+        print(
+            f"{result['policy']:<24} {result['chunks']:>7} "
+            f"{result['rtf']:>7.3f} {result['wer']:>7.2%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Compare the notes.json and SQLite note metadata stores on large corpora.
+
+Run from the src directory:
+    python -m benchmarks.metadata_store_benchmark --notes 10000 100000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+from notes.metadata_store import JsonMetadataStore, SqliteMetadataStore
+
+
+def make_note(directory, index):
+    note_uuid = str(uuid.uuid4())
+    timestamp = 1.7e9 + index * 60
+    return {
+        "uuid": note_uuid,
+        "title": f"Meeting {index}",
+        "path": os.path.join(directory, f"{note_uuid}.txt"),
+        "created_at": timestamp,
+        "updated_at": timestamp,
+    }
+
+
+def write_corpus(directory, count):
+    notes = {}
+    for index in range(count):
+        note = make_note(directory, index)
+        notes[note["uuid"]] = note
+    with open(os.path.join(directory, "notes.json"), "w") as f:
+        json.dump(notes, f, indent=2)
+    return list(notes)
+
+
+def time_ms(func, calls):
+    start = time.perf_counter()
+    for index in range(calls):
+        func(index)
+    return (time.perf_counter() - start) * 1000 / calls
+
+
+def run(store_class, count, ops):
+    directory = tempfile.mkdtemp()
+    try:
+        uuids = write_corpus(directory, count)
+        start = time.perf_counter()
+        # for SQLite this includes the one-time migration from notes.json
+        store = store_class(directory)
+        open_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        notes = store.load()
+        load_ms = (time.perf_counter() - start) * 1000
+
+        created = [make_note(directory, count + index) for index in range(ops)]
+
+        def rename(index):
+            note = notes[uuids[index]]
+            note["title"] += " (renamed)"
+            store.put(note)
+
+        results = {
+            "open": open_ms,
+            "load": load_ms,
+            "create": time_ms(lambda index: store.put(created[index]), ops),
+            "rename": time_ms(rename, ops),
+            "touch": time_ms(lambda index: store.touch(uuids[index], time.time()), ops),
+            "delete": time_ms(lambda index: store.delete(uuids[-1 - index]), ops),
+        }
+        store.close()
+        return results
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--notes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument(
+        "--ops", type=int, default=20, help="operations of each kind to time"
+    )
+    args = parser.parse_args()
+
+    columns = ["open", "load", "create", "rename", "touch", "delete"]
+    print(f"{'notes':>8} {'store':>7} " + " ".join(f"{c:>9}" for c in columns))
+    for count in args.notes:
+        for name, store_class in (
+            ("json", JsonMetadataStore),
+            ("sqlite", SqliteMetadataStore),
+        ):
+            results = run(store_class, count, args.ops)
+            print(
+                f"{count:>8} {name:>7} "
+                + " ".join(f"{results[c]:>7.2f}ms" for c in columns)
+            )
+    print("(open and load once per corpus, the rest per operation)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Compare the CPU cost of the streaming polyphase resampler against the previous
+per-block resampy path used by AudioCapture.
+
+Run from the src directory:
+    python -m benchmarks.resampler_benchmark --minutes 5
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from audio.resampler import StreamingResampler
+
+
+def make_blocks(sample_rate, channels, minutes, block_duration):
+    block_size = int(sample_rate * block_duration)
+    rng = np.random.default_rng(0)
+    # a handful of distinct blocks is enough, the cost does not depend on content
+    pool = [
+        (0.1 * rng.standard_normal((block_size, channels))).astype(np.float32)
+        for _ in range(16)
+    ]
+    count = int(minutes * 60 / block_duration)
+    return [pool[i % len(pool)] for i in range(count)]
+
+
+def run_resampy(blocks, sample_rate, target_rate):
+    import resampy
+
+    for block in blocks:
+        audio = block.T
+        if audio.shape[0] >= 2:
+            audio = np.mean(audio, axis=0)
+        resampy.resample(audio, sample_rate, target_rate).reshape(-1, 1)
+
+
+def run_streaming(blocks, sample_rate, target_rate):
+    resampler = StreamingResampler(sample_rate, target_rate, blocks[0].shape[0])
+    for block in blocks:
+        resampler.process(block).reshape(-1, 1)
+
+
+def cpu_seconds_per_hour(func, blocks, sample_rate, target_rate, minutes):
+    start = time.process_time()
+    func(blocks, sample_rate, target_rate)
+    elapsed = time.process_time() - start
+    return elapsed * 60.0 / minutes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--minutes", type=float, default=2.0)
+    parser.add_argument("--block-duration", type=float, default=0.05)
+    parser.add_argument("--target-rate", type=int, default=16000)
+    parser.add_argument("--skip-resampy", action="store_true")
+    args = parser.parse_args()
+
+    print(
+        f"{'input':>12} {'channels':>8} {'resampy':>12} {'streaming':>12} {'speedup':>8}"
+    )
+    for sample_rate in (44100, 48000):
+        for channels in (1, 2):
+            blocks = make_blocks(
+                sample_rate, channels, args.minutes, args.block_duration
+            )
+            streaming = cpu_seconds_per_hour(
+                run_streaming, blocks, sample_rate, args.target_rate, args.minutes
+            )
+            if args.skip_resampy:
+                resampy_cost = float("nan")
+            else:
+                # first call pays the numba compilation, keep it out of the timing
+                run_resampy(blocks[:1], sample_rate, args.target_rate)
+                resampy_cost = cpu_seconds_per_hour(
+                    run_resampy, blocks, sample_rate, args.target_rate, args.minutes
+                )
+            print(
+                f"{sample_rate:>10}Hz {channels:>8} {resampy_cost:>10.2f}s {streaming:>10.2f}s "
+                f"{resampy_cost / streaming:>7.1f}x"
+            )
+    print("(CPU-seconds per hour of audio)")
+
+
+if __name__ == "__main__":
+    main()
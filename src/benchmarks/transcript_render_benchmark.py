@@ -0,0 +1,123 @@
+"""
+Measure how long a transcript update takes as the transcript grows.
+
+Compares the old rendering, which rebuilt the whole text on every update, with
+the incremental TranscriptView. Each update adds a partial line and every few
+updates commits a segment, like a live meeting does.
+Run from the src directory:
+    python -m benchmarks.transcript_render_benchmark --segments 800
+"""
+
+import argparse
+import asyncio
+import time
+
+from textual.app import App, ComposeResult
+from textual.geometry import Region
+from textual.widgets import TextArea
+
+from audio.transcript_view import TranscriptView
+from utils.metrics import LatencyTracker
+
+SEGMENT = (
+    "and then we went over the numbers for the third quarter once more so that "
+    "everybody had the same picture before the planning meeting"
+)
+
+
+class FullTextView(TextArea):
+    """The rendering TranscriptionTextArea used before TranscriptView."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.transcriptions = []
+        self.partial_transcription = ""
+        self.read_only = True
+
+    def render_updates(self):
+        content = "\n".join(
+            self.transcriptions + [f"\n\n(p) {self.partial_transcription}\n"]
+        )
+        self.text = content
+        self.cursor_location = (len(self.text.split("\n")) + 1, 0)
+
+
+class RenderApp(App):
+    def __init__(self, view_class):
+        super().__init__()
+        self.view_class = view_class
+
+    def compose(self) -> ComposeResult:
+        yield self.view_class()
+
+
+def frame(view, update_tracker, frame_tracker):
+    """Time one update, and the update plus rendering the visible lines."""
+    start = time.perf_counter()
+    view.render_updates()
+    updated = time.perf_counter()
+    view.render_lines(Region(0, 0, view.size.width, view.size.height))
+    update_tracker.add(updated - start)
+    frame_tracker.add(time.perf_counter() - start)
+
+
+async def run(view_class, segments, partials_per_segment, checkpoints):
+    """
+    Returns:
+        list: (transcript length in segments, update time stats, frame time
+        stats) per checkpoint.
+    """
+    results = []
+    app = RenderApp(view_class)
+    async with app.run_test(size=(120, 40)) as pilot:
+        view = app.query_one(view_class)
+        update_tracker, frame_tracker = LatencyTracker(), LatencyTracker()
+        words = SEGMENT.split()
+        for index in range(segments):
+            for step in range(1, partials_per_segment + 1):
+                view.partial_transcription = " ".join(words[: step * 3])
+                frame(view, update_tracker, frame_tracker)
+                await pilot.pause(0)
+            view.transcriptions.append(f"{index}: {SEGMENT}")
+            view.partial_transcription = ""
+            frame(view, update_tracker, frame_tracker)
+            await pilot.pause(0)
+
+            if index + 1 in checkpoints:
+                results.append(
+                    (index + 1, update_tracker.stats(), frame_tracker.stats())
+                )
+                update_tracker, frame_tracker = LatencyTracker(), LatencyTracker()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--segments", type=int, default=800)
+    parser.add_argument("--partials", type=int, default=3, help="partials per segment")
+    args = parser.parse_args()
+
+    checkpoints = set()
+    size = 100
+    while size < args.segments:
+        checkpoints.add(size)
+        size *= 2
+    checkpoints.add(args.segments)
+
+    for name, view_class in (
+        ("full text", FullTextView),
+        ("incremental", TranscriptView),
+    ):
+        print(name)
+        for length, update, frame_time in asyncio.run(
+            run(view_class, args.segments, args.partials, checkpoints)
+        ):
+            print(
+                f"  {length:6d} segments: update p50 {update['p50_ms']:7.2f} ms, "
+                f"p95 {update['p95_ms']:7.2f} ms | frame p50 "
+                f"{frame_time['p50_ms']:7.2f} ms, p95 {frame_time['p95_ms']:7.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
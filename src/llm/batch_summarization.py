@@ -0,0 +1,216 @@
+"""
+Headless summarization of many notes with one template.
+
+Notes are summarized in parallel by a pool of processes that each hold their
+own llama.cpp context, so several sequences are decoded at once. The model
+file is memory-mapped, which lets the processes share the weights; only the
+contexts are per process. Each summary replaces the note's earlier AI summary
+and is written back through NoteManager. The workers add to the shared summary
+and prompt caches but leave evicting old entries to the app.
+"""
+
+import datetime
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from notes.manager import AI_SUMMARY_HEADING, TRANSCRIPTION_HEADING, NoteManager
+from utils.resource_path import resource_path
+
+_worker_model = None
+
+
+def _init_worker(threads):
+    global _worker_model
+    from llm.model import LanguageModel
+
+    LanguageModel.n_threads = threads
+    # the workers' cache indexes do not see each other's entries
+    LanguageModel.evict_caches = False
+    _worker_model = LanguageModel()
+
+
+def _summarize(note_text, transcription, template):
+    """
+    Returns:
+        tuple: (summary, tokens, seconds, saved). For a summary that came from
+        the summary cache, tokens is 0 and saved is the (bytes, seconds) of
+        generation the cache saved; saved is None for a generated summary.
+    """
+    cache = _worker_model.summary_cache
+    hits = cache.hits
+    bytes_saved = cache.bytes_saved
+    seconds_saved = cache.seconds_saved
+    start = time.perf_counter()
+    pieces = list(
+        _worker_model.generate_response(
+            note_text, transcription=transcription, template=template
+        )
+    )
+    if cache.hits == hits:
+        return "".join(pieces), len(pieces), time.perf_counter() - start, None
+    # a cached summary comes back in one piece, it was not generated
+    saved = (cache.bytes_saved - bytes_saved, cache.seconds_saved - seconds_saved)
+    return "".join(pieces), 0, time.perf_counter() - start, saved
+
+
+def split_note(note_manager: NoteManager, uuid):
+    """
+    Returns:
+        tuple: (notes, transcription) of a note, without an earlier AI summary.
+    """
+    content = note_manager.read_note(uuid).split(AI_SUMMARY_HEADING)[0]
+    note_text, _, transcription = content.partition(TRANSCRIPTION_HEADING)
+    if not transcription:
+        # notes from batch transcription keep it in a file of its own
+        transcription_path = note_manager.get_transcription_path(uuid)
+        if os.path.exists(transcription_path):
+            with open(transcription_path, "r") as f:
+                transcription = f.read()
+    return note_text, transcription or None
+
+
+def select_notes(note_manager: NoteManager, uuids, since=None):
+    """
+    Returns:
+        list: The given note uuids, or those of notes changed on or after since.
+    """
+    if uuids:
+        missing = [uuid for uuid in uuids if uuid not in note_manager.notes]
+        if missing:
+            raise KeyError(f"Notes not found: {', '.join(missing)}")
+        return list(uuids)
+    if since:
+        return note_manager.notes_changed_since(since.timestamp())
+    return [note["uuid"] for note in note_manager.list_notes(sort_by_date=True)]
+
+
+def load_template(name):
+    """Read a template file, or one of the bundled templates by name."""
+    if os.path.exists(name):
+        path = name
+    else:
+        path = resource_path(os.path.join("data", "templates", f"{name}.md"))
+    with open(path, "r") as f:
+        return f.read()
+
+
+def download_model():
+    # the workers load the model at the same time, fetch it once beforehand
+    from huggingface_hub import hf_hub_download
+    from utils.defaults import default_model, default_model_file
+    from utils.storage import fetch_data
+
+    hf_hub_download(
+        fetch_data("settings.json", "model", default_model),
+        fetch_data("settings.json", "model_file", default_model_file),
+    )
+
+
+class BatchSummarizer:
+    """
+    Args:
+        sequences: Notes summarized at the same time, one process each.
+        threads: llama.cpp threads per process.
+    """
+
+    def __init__(self, sequences, threads=None):
+        self.sequences = sequences
+        self.threads = threads or max(1, (os.cpu_count() or 1) // sequences)
+        self.note_manager = NoteManager()
+
+    def run(self, uuids, template):
+        start = time.perf_counter()
+        tokens = 0
+        cached = 0
+        bytes_saved = 0
+        seconds_saved = 0.0
+        with ProcessPoolExecutor(
+            max_workers=self.sequences,
+            initializer=_init_worker,
+            initargs=(self.threads,),
+        ) as pool:
+            futures = {}
+            for uuid in uuids:
+                note_text, transcription = split_note(self.note_manager, uuid)
+                future = pool.submit(_summarize, note_text, transcription, template)
+                futures[future] = uuid
+            for future in as_completed(futures):
+                uuid = futures[future]
+                try:
+                    summary, note_tokens, seconds, saved = future.result()
+                except Exception as e:
+                    print(f"Error summarizing note {uuid}: {e}")
+                    continue
+                self._write(uuid, summary)
+                if saved:
+                    cached += 1
+                    bytes_saved += saved[0]
+                    seconds_saved += saved[1]
+                    print(f"{uuid}: from the summary cache in {seconds:.1f}s")
+                    continue
+                tokens += note_tokens
+                print(f"{uuid}: {note_tokens} tokens in {seconds:.1f}s")
+
+        elapsed = time.perf_counter() - start
+        print(
+            f"Summarized {len(uuids)} note(s) in {elapsed:.1f}s: "
+            f"{len(uuids) / max(elapsed, 1e-9) * 60:.1f} notes/min, "
+            f"{len(uuids) - cached} generated at "
+            f"{tokens / max(elapsed, 1e-9):.1f} tokens/s, "
+            f"{cached} from the summary cache "
+            f"({cached / max(len(uuids), 1):.0%} hit rate, "
+            f"{bytes_saved / 1024:.1f} KB and {seconds_saved:.1f}s of generation saved)"
+        )
+
+    def _write(self, uuid, summary):
+        # replace an earlier summary, keep the notes and the transcription
+        content = self.note_manager.read_note(uuid).split(AI_SUMMARY_HEADING)[0]
+        self.note_manager.update_note_content(
+            uuid, f"{content}{AI_SUMMARY_HEADING}{summary}"
+        )
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "uuids", nargs="*", help="uuids of the notes to summarize (default: all)"
+    )
+    parser.add_argument(
+        "--since",
+        type=datetime.date.fromisoformat,
+        help="only notes changed on or after this date (YYYY-MM-DD)",
+    )
+    parser.add_argument(
+        "--template",
+        default="default",
+        help="name of a bundled template or path to a template file",
+    )
+    parser.add_argument(
+        "--sequences",
+        type=int,
+        default=2,
+        help="notes summarized in parallel, each in its own llama.cpp context",
+    )
+    parser.add_argument("--threads", type=int, help="llama.cpp threads per sequence")
+
+
+def main(args):
+    note_manager = NoteManager()
+    since = (
+        datetime.datetime.combine(args.since, datetime.time()) if args.since else None
+    )
+    try:
+        uuids = select_notes(note_manager, args.uuids, since)
+    except KeyError as e:
+        print(e.args[0])
+        return
+    if not uuids:
+        print("No notes to summarize")
+        return
+    try:
+        template = load_template(args.template)
+    except OSError as e:
+        print(f"Error reading template: {e}")
+        return
+    download_model()
+    BatchSummarizer(max(1, args.sequences), args.threads).run(uuids, template)
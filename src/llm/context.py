@@ -0,0 +1,163 @@
+"""
+Fits a prompt into the model's context window, counting in tokens.
+
+The query template's fields are filled in priority order: the summary template
+and the user's notes are kept whole whenever possible, and the transcription
+takes whatever room is left. Material that does not fit is compressed first
+(whitespace, filler words and repeated lines) and then cut out of the middle,
+so the beginning and the end of a long meeting survive.
+"""
+
+import re
+import string
+from typing import Callable, List
+
+# tokens the chat template wraps around the system and user messages
+CHAT_OVERHEAD = 32
+ELISION = "\n[...]\n"
+# lowest priority first, this is the order material is trimmed in
+TRIM_ORDER = ["transcription", "user_notes", "template"]
+# the user's own writing is cut if it must be, but never rewritten
+COMPRESSIBLE = {"transcription"}
+
+FILLER_WORDS = re.compile(r"\b(?:um+|uh+|erm|hmm+|you know|i mean)\b[,.]?\s*", re.I)
+
+
+def template_fields(query_template: str):
+    return {
+        field for _, field, _, _ in string.Formatter().parse(query_template) if field
+    }
+
+
+def compress_text(text: str) -> str:
+    """Drop filler words, repeated lines and redundant whitespace."""
+    text = FILLER_WORDS.sub("", text)
+    lines = []
+    for line in text.split("\n"):
+        line = " ".join(line.split())
+        if line and lines and line == lines[-1]:
+            continue
+        lines.append(line)
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+class ContextPacker:
+    """
+    Args:
+        tokenize: Turns text into a list of tokens.
+        detokenize: Turns a list of tokens back into text.
+    """
+
+    def __init__(
+        self,
+        tokenize: Callable[[str], List[int]],
+        detokenize: Callable[[List[int]], str],
+    ):
+        self.tokenize = tokenize
+        self.detokenize = detokenize
+
+    def count(self, text: str) -> int:
+        return len(self.tokenize(text)) if text else 0
+
+    def cut_middle(self, text: str, max_tokens: int) -> str:
+        """Keep the first and last parts of text within max_tokens."""
+        if max_tokens <= 0:
+            return ""
+        tokens = self.tokenize(text)
+        if len(tokens) <= max_tokens:
+            return text
+        keep = max_tokens - self.count(ELISION)
+        while keep > 0:
+            head = (keep + 1) // 2
+            tail = keep - head
+            text = (
+                self.detokenize(tokens[:head])
+                + ELISION
+                + (self.detokenize(tokens[-tail:]) if tail else "")
+            )
+            # tokens can merge differently across the cut, re-check the length
+            over = self.count(text) - max_tokens
+            if over <= 0:
+                return text
+            keep -= over
+        return ""
+
+    def fixed_tokens(self, system_prompt: str, query_template: str) -> int:
+        """Tokens used by everything but the template fields."""
+        used = template_fields(query_template)
+        return (
+            self.count(system_prompt)
+            + self.count(query_template.format(**{name: "" for name in used}))
+            + CHAT_OVERHEAD
+        )
+
+    def room_for(
+        self,
+        name: str,
+        system_prompt: str,
+        query_template: str,
+        fields: dict,
+        context_size: int,
+        output_reserve: int,
+    ) -> int:
+        """Tokens left for one field once the others are in place."""
+        others = sum(
+            self.count(fields.get(other) or "")
+            for other in template_fields(query_template)
+            if other != name
+        )
+        budget = context_size - output_reserve
+        return max(
+            budget - self.fixed_tokens(system_prompt, query_template) - others, 0
+        )
+
+    def pack(
+        self,
+        system_prompt: str,
+        query_template: str,
+        fields: dict,
+        context_size: int,
+        output_reserve: int,
+    ):
+        """
+        Returns:
+            tuple: (query, stats) where stats describes the token budget.
+        """
+        used = template_fields(query_template)
+        fields = {name: fields.get(name) or "" for name in used}
+        fixed = self.fixed_tokens(system_prompt, query_template)
+        budget = max(context_size - output_reserve - fixed, 0)
+        sizes = {name: self.count(text) for name, text in fields.items()}
+        original = dict(sizes)
+        compressed, trimmed = [], []
+
+        for name in TRIM_ORDER:
+            excess = sum(sizes.values()) - budget
+            if excess <= 0:
+                break
+            if name not in fields or not sizes[name]:
+                continue
+            text = compress_text(fields[name]) if name in COMPRESSIBLE else fields[name]
+            if text != fields[name]:
+                fields[name] = text
+                sizes[name] = self.count(text)
+                compressed.append(name)
+                excess = sum(sizes.values()) - budget
+            if excess > 0:
+                fields[name] = self.cut_middle(fields[name], sizes[name] - excess)
+                sizes[name] = self.count(fields[name])
+                trimmed.append(name)
+
+        query = query_template.format(**fields)
+        prompt_tokens = fixed + sum(sizes.values())
+        stats = {
+            "context_size": context_size,
+            "output_reserve": output_reserve,
+            "prompt_tokens": prompt_tokens,
+            "utilization": prompt_tokens / max(context_size - output_reserve, 1),
+            "field_tokens": sizes,
+            "dropped_tokens": sum(original.values()) - sum(sizes.values()),
+            "compressed": compressed,
+            "trimmed": trimmed,
+        }
+        return query, stats
@@ -0,0 +1,173 @@
+"""
+Runs LLM generation on a dedicated inference thread.
+
+Requests are queued as GenerationJobs in a bounded queue and handled one at a
+time, since the model has a single llama.cpp context. Tokens are handed to the
+job's on_token callback as they are decoded, and a job can be cancelled while
+it is queued or in the middle of generating.
+"""
+
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable
+
+from llm.summarize import GenerationCancelled
+from utils.model_loader import language_model_loader
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+
+class GenerationJob:
+    def __init__(
+        self,
+        uuid: str,
+        note_text: str,
+        transcription: str | None,
+        template: str | None,
+        on_token: Callable[[str], None] | None = None,
+    ):
+        self.uuid = uuid
+        self.note_text = note_text
+        self.transcription = transcription
+        self.template = template
+        self.on_token = on_token
+        self.state = QUEUED
+        self.tokens = []
+        self.detached_at = None
+        self.future = Future()
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        # set by the queue, resolves a job that has not started yet
+        self._on_cancel = None
+
+    def cancel(self):
+        self._cancel.set()
+        if self._on_cancel:
+            self._on_cancel(self)
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def active(self):
+        return self.state in (QUEUED, RUNNING)
+
+    def emit(self, token: str):
+        with self._lock:
+            self.tokens.append(token)
+            on_token = self.on_token
+        if on_token:
+            on_token(token)
+
+    def detach(self):
+        """
+        Stop delivering tokens to on_token, e.g. because the editor was closed.
+
+        Returns:
+            int: How many tokens were delivered before detaching.
+        """
+        with self._lock:
+            self.on_token = None
+            self.detached_at = len(self.tokens)
+            return self.detached_at
+
+    def text(self, start: int = 0) -> str:
+        with self._lock:
+            return "".join(self.tokens[start:])
+
+
+class GenerationQueue:
+    """
+    Args:
+        get_model: Returns the LanguageModel to generate with. Called on the
+            inference thread, so it may block while the model loads.
+        max_jobs: Jobs that can wait in the queue; submit() raises queue.Full
+            beyond that.
+    """
+
+    def __init__(self, get_model: Callable, max_jobs: int = 4):
+        self.get_model = get_model
+        self.max_jobs = max_jobs
+        self._waiting = deque()
+        self._condition = threading.Condition()
+        self._jobs = {}  # uuid -> latest job for that note
+        self._thread = None
+
+    def submit(self, job: GenerationJob) -> GenerationJob:
+        with self._condition:
+            current = self._jobs.get(job.uuid)
+            if current and current.active():
+                raise ValueError("The LLM is already running for this note")
+            if len(self._waiting) >= self.max_jobs:
+                raise queue.Full
+            job._on_cancel = self._cancel_waiting
+            self._waiting.append(job)
+            self._jobs[job.uuid] = job
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return job
+
+    def _cancel_waiting(self, job: GenerationJob):
+        # a job that has not started is resolved right away and frees its slot,
+        # a running one stops at the next check of job.cancelled
+        with self._condition:
+            if job not in self._waiting:
+                return
+            self._waiting.remove(job)
+            job.state = CANCELLED
+        job.future.set_result(job)
+
+    def job_for(self, uuid: str) -> GenerationJob | None:
+        with self._condition:
+            return self._jobs.get(uuid)
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._waiting)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._waiting:
+                    self._condition.wait()
+                job = self._waiting.popleft()
+                job.state = RUNNING
+            try:
+                model = self.get_model()
+                stream = model.generate_response(
+                    job.note_text,
+                    transcription=job.transcription,
+                    template=job.template,
+                    should_stop=lambda: job.cancelled,
+                )
+                try:
+                    for token in stream:
+                        if job.cancelled:
+                            break
+                        job.emit(token)
+                except GenerationCancelled:
+                    # stopped while condensing the transcription
+                    pass
+                finally:
+                    # stops llama.cpp decoding straight away
+                    stream.close()
+                if job.cancelled:
+                    model.release_state()
+                    job.state = CANCELLED
+                else:
+                    job.state = DONE
+                job.future.set_result(job)
+            except Exception as e:
+                job.state = FAILED
+                job.future.set_exception(e)
+
+
+generation_queue = GenerationQueue(language_model_loader.get)
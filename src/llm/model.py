@@ -1,12 +1,33 @@
 from llama_cpp import Llama, llama_log_set
 import ctypes
-from utils.storage import fetch_data, subscribe_to_data
+import hashlib
+import os
+import threading
+import time
+from textual import log
+from llm.context import ContextPacker, template_fields
+from llm.prefix_cache import (
+    MIN_PREFIX_TOKENS,
+    SHARED_PREFIX_MARGIN,
+    PrefixStateCache,
+)
+from llm.summarize import GenerationCancelled, MapReduceSummarizer
+from llm.summary_cache import SummaryCache, summary_key
+from utils.metrics import LatencyTracker
+from utils.storage import fetch_data, get_data_dir, subscribe_to_data
 from utils.defaults import (
     default_system_prompt,
+    default_chunk_summary_prompt,
     default_model,
     default_model_file,
     default_context_size,
+    default_output_reserve,
+    default_prompt_cache_mb,
+    default_prompt_disk_cache_mb,
     default_query_template,
+    default_summary_cache_mb,
+    default_summary_chunk_tokens,
+    default_summary_tokens,
 )
 
 
@@ -14,8 +35,72 @@ def my_log_callback(level, message, user_data):
     pass
 
 
+# settings changes closer together than this cause a single reload
+RELOAD_DELAY = 0.5
+
+
+class LoadedModel:
+    """
+    A llama.cpp model with everything that depends on it. A reload replaces the
+    whole object, so a request that took one keeps a consistent set to the end.
+
+    Args:
+        llm: The llama.cpp model.
+        model_id: repository/file name of the model.
+        context_size: Tokens in the context window llm was created with.
+        prompt_cache: The PrefixStateCache set on llm.
+    """
+
+    def __init__(self, llm, model_id: str, context_size: int, prompt_cache):
+        self.llm = llm
+        self.model_id = model_id
+        self.context_size = context_size
+        self.prompt_cache = prompt_cache
+        self.packer = ContextPacker(self.tokenize, self.detokenize)
+        self.summarizer = MapReduceSummarizer(self)
+
+    def tokenize(self, text: str):
+        return self.llm.tokenize(text.encode("utf-8"), add_bos=False, special=False)
+
+    def detokenize(self, tokens) -> str:
+        return self.llm.detokenize(tokens).decode("utf-8", errors="ignore")
+
+    def complete(
+        self, system_prompt: str, text: str, max_tokens: int, should_stop=None
+    ) -> str:
+        """
+        Raises:
+            GenerationCancelled: should_stop returned True before the end.
+        """
+        llm = self.llm
+        pieces = []
+        # chunk summaries share nothing worth restoring later, and saving the
+        # state of each would copy it out of the context for nothing
+        llm.set_cache(None)
+        try:
+            # streamed so a cancel is noticed between tokens
+            for chunk in llm.create_chat_completion(
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": text},
+                ],
+                max_tokens=max_tokens,
+                stream=True,
+            ):
+                if should_stop and should_stop():
+                    raise GenerationCancelled()
+                pieces.append(chunk["choices"][0]["delta"].get("content") or "")
+        finally:
+            llm.set_cache(self.prompt_cache)
+        return "".join(pieces)
+
+
 class LanguageModel:
     _instance = None
+    # llama.cpp threads, None lets llama.cpp decide
+    n_threads = None
+    # whether this process removes old entries from the on-disk caches
+    evict_caches = True
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
@@ -23,56 +108,251 @@ class LanguageModel:
         return cls._instance
 
     def __init__(self):
-        if not hasattr(self, "llm"):
+        if not hasattr(self, "loaded"):
             # log_callback = ctypes.CFUNCTYPE(
             #     None, ctypes.c_int, ctypes.c_char_p, ctypes.c_void_p
             # )(my_log_callback)
             # llama_log_set(log_callback, ctypes.c_void_p())
-            self.set_model(None)
-            subscribe_to_data("settings.json", "model", self.set_model)
-            subscribe_to_data("settings.json", "context_size", self.set_model)
+            self.config = None
+            self.reloading = False
+            # held while the model is swapped, _load_lock for a whole reload
+            self._reload_lock = threading.Lock()
+            self._load_lock = threading.Lock()
+            self._timer_lock = threading.Lock()
+            self._reload_timer = None
+            self.first_token_latency = LatencyTracker()
+            # a single llama.cpp context decodes one request at a time
+            self.parallel_requests = 1
+            cache_mb = fetch_data(
+                "settings.json", "summary_cache_mb", default_summary_cache_mb
+            )
+            self.summary_cache = SummaryCache(
+                os.path.join(get_data_dir(), "summary_cache"),
+                int(cache_mb) << 20,
+                self.evict_caches,
+            )
+            self.load(self.configured())
+            for key in ("model", "model_file", "context_size"):
+                subscribe_to_data("settings.json", key, self.schedule_reload)
 
-    def set_model(self, _):
-        self.context_size = fetch_data(
-            "settings.json", "context_size", default_context_size
+    def configured(self):
+        """
+        Returns:
+            tuple: (repository, model file, context size) from the settings.
+        """
+        return (
+            fetch_data("settings.json", "model", default_model),
+            fetch_data("settings.json", "model_file", default_model_file),
+            fetch_data("settings.json", "context_size", default_context_size),
         )
-        self.llm = Llama.from_pretrained(
-            repo_id=fetch_data("settings.json", "model", default_model),
-            filename=fetch_data("settings.json", "model_file", default_model_file),
+
+    def load(self, config):
+        repo_id, filename, context_size = config
+        llm = Llama.from_pretrained(
+            repo_id=repo_id,
+            filename=filename,
             verbose=False,
-            n_ctx=self.context_size,
+            n_ctx=context_size,
+            n_threads=self.n_threads,
+        )
+        model_id = f"{repo_id}/{filename}"
+        prompt_cache = self.create_prompt_cache(model_id, context_size)
+        # restores the state of the longest cached prompt prefix before each request
+        llm.set_cache(prompt_cache)
+        loaded = LoadedModel(llm, model_id, context_size, prompt_cache)
+        # switch everything over at once, requests already running keep the old model
+        with self._reload_lock:
+            self.loaded = loaded
+            self.config = config
+
+    def snapshot(self) -> LoadedModel:
+        """
+        Returns:
+            LoadedModel: The current model, to be used for a whole request.
+        """
+        with self._reload_lock:
+            return self.loaded
+
+    @property
+    def llm(self):
+        return self.snapshot().llm
+
+    @property
+    def model_id(self) -> str:
+        return self.snapshot().model_id
+
+    def schedule_reload(self, _=None):
+        """Reload the model once the settings have stopped changing."""
+        with self._timer_lock:
+            if self._reload_timer:
+                self._reload_timer.cancel()
+            self._reload_timer = threading.Timer(RELOAD_DELAY, self.reload)
+            self._reload_timer.daemon = True
+            self._reload_timer.start()
+
+    def reload(self):
+        # requests keep running on the old model while the new one loads
+        with self._load_lock:
+            config = self.configured()
+            if config == self.config:
+                return
+            print(f"Loading language model {config[0]}/{config[1]}")
+            self.reloading = True
+            try:
+                self.load(config)
+            except Exception as e:
+                # keep serving with the model that is already loaded
+                print(f"Error loading language model: {e}")
+            finally:
+                self.reloading = False
+
+    def create_prompt_cache(self, model_id: str, context_size: int):
+        model_key = f"{model_id}:{context_size}".encode("utf-8")
+        ram_mb = fetch_data("settings.json", "prompt_cache_mb", default_prompt_cache_mb)
+        disk_mb = fetch_data(
+            "settings.json", "prompt_disk_cache_mb", default_prompt_disk_cache_mb
+        )
+        return PrefixStateCache(
+            os.path.join(
+                get_data_dir(),
+                "prompt_cache",
+                hashlib.sha256(model_key).hexdigest()[:16],
+            ),
+            int(ram_mb) << 20,
+            int(disk_mb) << 20,
+            self.evict_caches,
+        )
+
+    def release_state(self):
+        """Free the KV cache left behind by an interrupted request."""
+        llm = self.llm
+        llm.reset()
+        if hasattr(llm, "_ctx") and hasattr(llm._ctx, "kv_cache_clear"):
+            llm._ctx.kv_cache_clear()
+
+    def condense_transcription(
+        self, transcription: str, max_tokens: int, should_stop=None, loaded=None
+    ) -> str:
+        """
+        Summarize a transcription in pieces until it fits in max_tokens.
+
+        Args:
+            loaded: The model to use, the current one by default.
+        """
+        loaded = loaded or self.snapshot()
+        condensed = loaded.summarizer.condense(
+            transcription,
+            max_tokens,
+            fetch_data("settings.json", "chunk_prompt", default_chunk_summary_prompt),
+            fetch_data(
+                "settings.json", "summary_chunk_tokens", default_summary_chunk_tokens
+            ),
+            fetch_data("settings.json", "summary_tokens", default_summary_tokens),
+            workers=self.parallel_requests,
+            should_stop=should_stop,
         )
+        log.info(f"Map-reduce summarizer stats: {loaded.summarizer.stats()}")
+        return condensed
 
     def generate_response(
         self,
         note_text: str,
         transcription: str | None = None,
         template: str | None = None,
+        should_stop=None,
     ):
+        """
+        Yields the answer as it is generated.
+
+        Args:
+            should_stop: Checked until the answer starts streaming;
+                GenerationCancelled is raised once it returns True.
+        """
+        # a reload swaps the model, this request stays with the one it started on
+        loaded = self.snapshot()
+        llm, packer, context_size = loaded.llm, loaded.packer, loaded.context_size
         query_template = fetch_data("settings.json", "query", default_query_template)
-        query = query_template.format(
-            user_notes=note_text,
-            transcription=transcription or "",
-            template=template or "",
+        system_prompt = fetch_data("settings.json", "prompt", default_system_prompt)
+        output_reserve = fetch_data(
+            "settings.json", "output_reserve", default_output_reserve
+        )
+        cache_key = summary_key(
+            loaded.model_id,
+            f"{context_size}:{output_reserve}",
+            system_prompt,
+            query_template,
+            template,
+            note_text,
+            transcription,
+        )
+        summary = self.summary_cache.get(cache_key)
+        if summary is not None:
+            log.info(f"Summary cache stats: {self.summary_cache.stats()}")
+            yield summary
+            return
+
+        if transcription and "transcription" not in template_fields(query_template):
+            # the query template has no place for it, keep it with the notes
+            note_text = f"{note_text}\n\n# Transcription\n\n{transcription}"
+            transcription = None
+        fields = {
+            "user_notes": note_text,
+            "transcription": transcription,
+            "template": template,
+        }
+        if transcription:
+            room = packer.room_for(
+                "transcription",
+                system_prompt,
+                query_template,
+                fields,
+                context_size,
+                output_reserve,
+            )
+            if packer.count(transcription) > room:
+                fields["transcription"] = self.condense_transcription(
+                    transcription, room, should_stop, loaded
+                )
+        # make sure the prompt and the answer fit in the context window
+        query, context_stats = packer.pack(
+            system_prompt,
+            query_template,
+            fields,
+            context_size,
+            output_reserve,
+        )
+        log.info(f"Context stats: {context_stats}")
+        # only keep a new prompt state if no cached one covers the system
+        # prompt and the template yet, the notes after them differ every time
+        shared = packer.count(system_prompt)
+        if template and template in query:
+            shared += packer.count(query[: query.index(template) + len(template)])
+        loaded.prompt_cache.shared_prefix_tokens = max(
+            MIN_PREFIX_TOKENS, int(shared * SHARED_PREFIX_MARGIN)
         )
-        # make sure query fits in context size
-        query = query[: self.context_size - 2]
-        # write to a file for debugging
-        with open("query.txt", "w") as f:
-            f.write(query)
 
-        for chunk in self.llm.create_chat_completion(
+        if should_stop and should_stop():
+            raise GenerationCancelled()
+        start = time.perf_counter()
+        first_token = True
+        pieces = []
+        for chunk in llm.create_chat_completion(
             messages=[
-                {
-                    "role": "system",
-                    "content": fetch_data(
-                        "settings.json", "prompt", default_system_prompt
-                    ),
-                },
+                {"role": "system", "content": system_prompt},
                 {"role": "user", "content": query},
             ],
             stream=True,
         ):
             if "content" not in chunk["choices"][0]["delta"]:
                 continue
-            yield chunk["choices"][0]["delta"]["content"]
+            if first_token:
+                first_token = False
+                elapsed = time.perf_counter() - start
+                self.first_token_latency.add(elapsed)
+            pieces.append(chunk["choices"][0]["delta"]["content"])
+            yield pieces[-1]
+        # only reached when the whole answer was generated, not on cancel
+        self.summary_cache.put(cache_key, "".join(pieces), time.perf_counter() - start)
+        log.info(f"Summary cache stats: {self.summary_cache.stats()}")
+        log.info(f"Time to first token: {self.first_token_latency.stats()}")
+        log.info(f"Prompt cache stats: {loaded.prompt_cache.stats()}")
@@ -0,0 +1,240 @@
+"""
+llama.cpp state cache keyed by prompt tokens, kept in memory and on disk.
+
+llama-cpp-python looks up the cached state whose tokens share the longest
+prefix with a new prompt and restores it, so only the tokens after the shared
+prefix are evaluated. With the system prompt and the template at the start of
+every request, a repeat summarization skips straight past them. A state is only
+kept when no cached state covers the request's shared prefix yet, so there is
+about one per system prompt and template rather than one per note. Disk writes
+happen on a background thread; the least recently used states are evicted when
+a tier goes over its capacity, and evicted memory entries stay available on disk.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict, deque
+from typing import Sequence, Tuple
+
+from llama_cpp.llama import Llama, LlamaState
+from llama_cpp.llama_cache import BaseLlamaCache
+
+# restoring a state only pays off once it covers more than the chat preamble
+MIN_PREFIX_TOKENS = 32
+# states waiting for the disk writer, more than this are not written
+MAX_PENDING_WRITES = 2
+# the shared prefix is counted on the system prompt and the template on their
+# own, but llama.cpp tokenizes them inside the chat template, where the tokens
+# at the joins can merge differently; a cached state covering this fraction of
+# the counted prefix is taken to cover all of it
+SHARED_PREFIX_MARGIN = 0.95
+
+
+def state_size(state: LlamaState) -> int:
+    return state.llama_state_size + state.scores.nbytes + state.input_ids.nbytes
+
+
+class PrefixStateCache(BaseLlamaCache):
+    """
+    Args:
+        directory: Where states are stored on disk, one directory per model.
+        ram_bytes: Capacity of the in-memory tier.
+        disk_bytes: Capacity of the on-disk tier, 0 to keep states in memory only.
+        evict: Whether to remove the oldest states from disk once over capacity.
+            When several processes add to the same directory, only one should.
+    """
+
+    def __init__(
+        self, directory: str, ram_bytes: int, disk_bytes: int, evict: bool = True
+    ):
+        super().__init__(capacity_bytes=ram_bytes)
+        self.directory = directory
+        self.disk_bytes = disk_bytes
+        self.evict = evict
+        self._ram = OrderedDict()  # tokens -> (state, size)
+        self._disk = OrderedDict()  # tokens -> (file name, size), oldest first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.skipped = 0
+        # tokens at the start of the current request that other requests share,
+        # set by the caller before each completion; the llama.cpp context this
+        # cache is set on evaluates one request at a time
+        self.shared_prefix_tokens = MIN_PREFIX_TOKENS
+        self._pending = deque()
+        self._writer = None
+        self._written = threading.Condition(self._lock)
+        if disk_bytes:
+            os.makedirs(directory, exist_ok=True)
+            self._load_index()
+            self._trim_disk()
+
+    @property
+    def cache_size(self):
+        return sum(size for _, size in self._ram.values())
+
+    def disk_size(self):
+        return sum(size for _, size in self._disk.values())
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, "r") as f:
+                    entry = json.load(f)
+                state_path = os.path.join(self.directory, entry["file"])
+                entries.append(
+                    (os.path.getmtime(state_path), tuple(entry["tokens"]), entry)
+                )
+            except (OSError, ValueError, KeyError):
+                continue
+        for _, tokens, entry in sorted(entries, key=lambda item: item[0]):
+            self._disk[tokens] = (entry["file"], entry["size"])
+
+    def _longest_prefix(self, entries, key: Tuple[int, ...]):
+        best, best_length = None, 0
+        for tokens in entries:
+            length = Llama.longest_token_prefix(tokens, key)
+            if length > best_length:
+                best, best_length = tokens, length
+        return best, best_length
+
+    def __getitem__(self, key: Sequence[int]) -> LlamaState:
+        key = tuple(key)
+        with self._lock:
+            ram_key, ram_length = self._longest_prefix(self._ram, key)
+            disk_key, disk_length = self._longest_prefix(self._disk, key)
+            if max(ram_length, disk_length) < MIN_PREFIX_TOKENS:
+                self.misses += 1
+                raise KeyError("No cached prefix")
+            if ram_length >= disk_length:
+                self._ram.move_to_end(ram_key)
+                self.hits += 1
+                return self._ram[ram_key][0]
+            state = self._read(disk_key)
+            if state is None:
+                self.misses += 1
+                raise KeyError("No cached prefix")
+            self.disk_hits += 1
+            self._put_ram(disk_key, state)
+            return state
+
+    def __contains__(self, key: Sequence[int]) -> bool:
+        key = tuple(key)
+        with self._lock:
+            return key in self._ram or key in self._disk
+
+    def __setitem__(self, key: Sequence[int], value: LlamaState):
+        key = tuple(key)
+        with self._lock:
+            covered = max(
+                self._longest_prefix(self._ram, key)[1],
+                self._longest_prefix(self._disk, key)[1],
+            )
+            if covered >= self.shared_prefix_tokens:
+                # a cached state already skips the shared part of this prompt
+                self.skipped += 1
+                return
+            self._put_ram(key, value)
+            if not self.disk_bytes or key in self._disk:
+                return
+            if len(self._pending) >= MAX_PENDING_WRITES:
+                print("Prompt cache disk writer is behind, not saving state")
+                return
+            self._pending.append((key, value))
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_pending, daemon=True)
+                self._writer.start()
+            self._written.notify_all()
+
+    def _write_pending(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._written.wait()
+                key, state = self._pending[0]
+            # pickling a state takes a while, keep it off the inference thread
+            self._write(key, state)
+            with self._lock:
+                self._pending.popleft()
+                self._written.notify_all()
+
+    def flush(self):
+        """Wait until all states have been written to disk."""
+        with self._lock:
+            while self._pending:
+                self._written.wait()
+
+    def _put_ram(self, key, state):
+        self._ram.pop(key, None)
+        self._ram[key] = (state, state_size(state))
+        while self._ram and self.cache_size > self.capacity_bytes:
+            self._ram.popitem(last=False)
+
+    def _name(self, key):
+        return hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()[:32]
+
+    def _write(self, key, state):
+        name = self._name(key)
+        state_file = name + ".state"
+        try:
+            with open(os.path.join(self.directory, state_file), "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            size = os.path.getsize(os.path.join(self.directory, state_file))
+            # the index entry is written last, a state without one is never read
+            with open(os.path.join(self.directory, name + ".json"), "w") as f:
+                json.dump({"tokens": list(key), "file": state_file, "size": size}, f)
+        except OSError as e:
+            print(f"Error writing prompt cache: {e}")
+            return
+        with self._lock:
+            self._disk[key] = (state_file, size)
+            self._trim_disk()
+
+    def _trim_disk(self):
+        while self.evict and self._disk and self.disk_size() > self.disk_bytes:
+            _, (old_file, _) = self._disk.popitem(last=False)
+            self._remove(old_file)
+
+    def _read(self, key):
+        state_file, _ = self._disk[key]
+        path = os.path.join(self.directory, state_file)
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+            os.utime(path)
+        except Exception as e:
+            print(f"Error reading prompt cache: {e}")
+            del self._disk[key]
+            self._remove(state_file)
+            return None
+        self._disk.move_to_end(key)
+        return state
+
+    def _remove(self, state_file):
+        for path in (state_file, state_file[: -len(".state")] + ".json"):
+            try:
+                os.remove(os.path.join(self.directory, path))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ram_entries": len(self._ram),
+                "ram_mb": self.cache_size / (1 << 20),
+                "disk_entries": len(self._disk),
+                "disk_mb": self.disk_size() / (1 << 20),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "skipped": self.skipped,
+                "pending_writes": len(self._pending),
+            }
@@ -0,0 +1,450 @@
+"""
+Local inference server that lets several Note Taker processes share one model.
+
+`python main.py serve` loads one LanguageModel and answers OpenAI-compatible
+requests on localhost: /v1/chat/completions and /v1/models, plus
+/v1/notes/summaries, which runs the app's own prompt building (context packing,
+transcript condensing and the summary cache) on the server, and
+/v1/audio/transcriptions, which transcribes a WAV file. Responses stream as
+server-sent events.
+
+The model decodes one request at a time. Waiting requests are served round
+robin by client, so one client queueing many requests does not hold up the
+others. When the TUI starts it checks for a running server and uses it through
+RemoteLanguageModel, otherwise it loads the model itself.
+"""
+
+import http.client
+import io
+import json
+import os
+import select
+import socket
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm.summarize import GenerationCancelled
+
+HOST = "127.0.0.1"
+# largest request bodies accepted, an hour of 16-bit 48 kHz stereo WAV fits
+MAX_JSON_BYTES = 16 << 20
+MAX_AUDIO_BYTES = 768 << 20
+
+
+class FairScheduler:
+    """Gives a single resource to waiting clients in turn."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._waiting = OrderedDict()  # client -> tickets, in serving order
+        self._busy = False
+
+    def _next(self):
+        for tickets in self._waiting.values():
+            return tickets[0]
+        return None
+
+    @contextmanager
+    def turn(self, client: str):
+        """Wait until it is client's turn and hold the resource meanwhile."""
+        ticket = object()
+        with self._condition:
+            self._waiting.setdefault(client, deque()).append(ticket)
+            while self._busy or self._next() is not ticket:
+                self._condition.wait()
+            tickets = self._waiting.pop(client)
+            tickets.popleft()
+            if tickets:
+                # the client's next request waits behind the other clients
+                self._waiting[client] = tickets
+            self._busy = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._busy = False
+                self._condition.notify_all()
+
+    def waiting(self) -> int:
+        with self._condition:
+            return sum(len(tickets) for tickets in self._waiting.values())
+
+
+def completion_chunk(model_id: str, content: str | None, finish_reason=None):
+    return {
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model_id,
+        "choices": [
+            {
+                "index": 0,
+                "delta": {"content": content} if content is not None else {},
+                "finish_reason": finish_reason,
+            }
+        ],
+    }
+
+
+class InferenceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, model):
+        super().__init__((HOST, port), InferenceRequestHandler)
+        self.model = model
+        self.scheduler = FairScheduler()
+        self.whisper_scheduler = FairScheduler()
+        self._whisper_model = None
+
+    def whisper_model(self):
+        # only loaded once a client asks for a transcription
+        if self._whisper_model is None:
+            from simpler_whisper.whisper import WhisperModel
+            from audio.model_registry import configured_model_name, resolve_model_path
+
+            self._whisper_model = WhisperModel(
+                resolve_model_path(configured_model_name()), use_gpu=False
+            )
+        return self._whisper_model
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    server: InferenceServer
+
+    def _send_json(self, status: int, data: dict):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str):
+        self._send_json(status, {"error": {"message": message}})
+
+    def _start_events(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+    def _send_event(self, data):
+        payload = data if isinstance(data, str) else json.dumps(data)
+        self.wfile.write(f"data: {payload}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _read_body(self, max_bytes: int) -> bytes | None:
+        """
+        Returns:
+            bytes | None: The request body, or None after answering with an
+            error because it is missing a valid length or is too large.
+        """
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send_error(400, "Invalid Content-Length")
+            return None
+        if length > max_bytes:
+            self._send_error(413, f"Request body larger than {max_bytes} bytes")
+            # the unread body would otherwise be parsed as the next request
+            self.close_connection = True
+            return None
+        return self.rfile.read(length)
+
+    def _client_gone(self) -> bool:
+        # a closed connection reads as readable with nothing to read
+        readable, _, _ = select.select([self.connection], [], [], 0)
+        try:
+            return bool(readable) and not self.connection.recv(1, socket.MSG_PEEK)
+        except OSError:
+            return True
+
+    def _client(self, request: dict) -> str:
+        return (
+            request.get("user")
+            or self.headers.get("X-Client-Id")
+            or self.client_address[0]
+        )
+
+    def do_GET(self):
+        model = self.server.model
+        if self.path == "/health":
+            self._send_json(
+                200,
+                {
+                    "status": "ok",
+                    "model": model.model_id,
+                    "waiting": self.server.scheduler.waiting(),
+                },
+            )
+        elif self.path == "/v1/models":
+            self._send_json(
+                200,
+                {
+                    "object": "list",
+                    "data": [
+                        {"id": model.model_id, "object": "model", "owned_by": "local"}
+                    ],
+                },
+            )
+        else:
+            self._send_error(404, f"Unknown path {self.path}")
+
+    def do_POST(self):
+        if self.path == "/v1/audio/transcriptions":
+            body = self._read_body(MAX_AUDIO_BYTES)
+            if body is not None:
+                self._transcribe(body)
+            return
+        body = self._read_body(MAX_JSON_BYTES)
+        if body is None:
+            return
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError as e:
+            self._send_error(400, f"Invalid JSON: {e}")
+            return
+        if self.path == "/v1/chat/completions":
+            self._chat_completion(request)
+        elif self.path == "/v1/notes/summaries":
+            self._note_summary(request)
+        else:
+            self._send_error(404, f"Unknown path {self.path}")
+
+    def _chat_completion(self, request: dict):
+        model = self.server.model
+        options = {
+            key: request[key]
+            for key in ("max_tokens", "temperature", "top_p", "stop", "seed")
+            if key in request
+        }
+        with self.server.scheduler.turn(self._client(request)):
+            llm = model.llm
+            try:
+                response = llm.create_chat_completion(
+                    messages=request.get("messages", []),
+                    stream=bool(request.get("stream")),
+                    **options,
+                )
+            except Exception as e:
+                self._send_error(500, str(e))
+                return
+            if not request.get("stream"):
+                self._send_json(200, response)
+                return
+            self._stream(response, lambda chunk: chunk)
+
+    def _note_summary(self, request: dict):
+        model = self.server.model
+        with self.server.scheduler.turn(self._client(request)):
+            response = model.generate_response(
+                request.get("note_text", ""),
+                transcription=request.get("transcription"),
+                template=request.get("template"),
+                should_stop=self._client_gone,
+            )
+            self._stream(
+                response, lambda token: completion_chunk(model.model_id, token)
+            )
+
+    def _stream(self, response, to_chunk):
+        self._start_events()
+        cancelled = False
+        try:
+            for item in response:
+                self._send_event(to_chunk(item))
+            self._send_event("[DONE]")
+        except (BrokenPipeError, ConnectionResetError, GenerationCancelled):
+            # the client went away, stop decoding
+            cancelled = True
+        except Exception as e:
+            print(f"Error generating response: {e}")
+            try:
+                self._send_event({"error": {"message": str(e)}})
+            except OSError:
+                pass
+        finally:
+            response.close()
+        if cancelled:
+            self.server.model.release_state()
+
+    def _transcribe(self, body: bytes):
+        from audio.batch_transcription import read_wav, split_at_silences
+
+        try:
+            audio = read_wav(io.BytesIO(body))
+        except Exception as e:
+            self._send_error(400, f"Invalid WAV file: {e}")
+            return
+        client = self.headers.get("X-Client-Id") or self.client_address[0]
+        with self.server.whisper_scheduler.turn(client):
+            try:
+                whisper = self.server.whisper_model()
+                texts = []
+                for segment, overlap in split_at_silences(audio, 1.0, 25.0):
+                    texts.append(
+                        " ".join(
+                            result.text.strip()
+                            for result in whisper.transcribe(segment)
+                            if result.end > overlap * 1000
+                        ).strip()
+                    )
+            except Exception as e:
+                self._send_error(500, str(e))
+                return
+        self._send_json(200, {"text": "\n".join(text for text in texts if text)})
+
+
+def server_running(port: int, timeout: float = 0.2) -> bool:
+    connection = http.client.HTTPConnection(HOST, port, timeout=timeout)
+    try:
+        connection.request("GET", "/health")
+        return connection.getresponse().status == 200
+    except OSError:
+        return False
+    finally:
+        connection.close()
+
+
+class RemoteLanguageModel:
+    """
+    Stands in for LanguageModel when a server is running, generating responses
+    on the server instead of in this process. If the server stops, the model is
+    loaded in this process and used from then on.
+    """
+
+    def __init__(self, port: int):
+        self.port = port
+        self.client_id = f"note-taker-{os.getpid()}"
+        self._local = None
+        self._lock = threading.Lock()
+
+    def _local_model(self):
+        with self._lock:
+            if self._local is None:
+                from llm.model import LanguageModel
+
+                self._local = LanguageModel()
+            return self._local
+
+    def generate_response(
+        self,
+        note_text: str,
+        transcription: str | None = None,
+        template: str | None = None,
+        should_stop=None,
+    ):
+        if self._local is None:
+            started = False
+            try:
+                for piece in self._generate_remote(
+                    note_text, transcription, template, should_stop
+                ):
+                    started = True
+                    yield piece
+                return
+            except OSError:
+                # only start over locally if none of the answer was shown yet
+                if started or server_running(self.port):
+                    raise
+        yield from self._local_model().generate_response(
+            note_text, transcription, template, should_stop
+        )
+
+    def _generate_remote(self, note_text, transcription, template, should_stop):
+        # no timeout, the request may wait for other clients first
+        connection = http.client.HTTPConnection(HOST, self.port)
+        done = threading.Event()
+
+        def watch(sock):
+            # reading blocks until the server sends something, shutting the
+            # socket down is what interrupts it
+            while not done.wait(0.1):
+                if should_stop():
+                    try:
+                        sock.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+                    return
+
+        try:
+            connection.request(
+                "POST",
+                "/v1/notes/summaries",
+                json.dumps(
+                    {
+                        "note_text": note_text,
+                        "transcription": transcription,
+                        "template": template,
+                        "user": self.client_id,
+                    }
+                ),
+                {"Content-Type": "application/json", "X-Client-Id": self.client_id},
+            )
+            if should_stop:
+                threading.Thread(
+                    target=watch, args=(connection.sock,), daemon=True
+                ).start()
+            response = connection.getresponse()
+            if response.status != 200:
+                raise RuntimeError(f"Server error {response.status}: {response.read()}")
+            finished = False
+            for line in response:
+                if not line.startswith(b"data: "):
+                    continue
+                data = line[len(b"data: ") :].strip()
+                if data == b"[DONE]":
+                    finished = True
+                    break
+                chunk = json.loads(data)
+                if "error" in chunk:
+                    raise RuntimeError(chunk["error"]["message"])
+                content = chunk["choices"][0]["delta"].get("content")
+                if content:
+                    yield content
+            if not finished:
+                raise ConnectionError("The server closed the connection")
+        except (OSError, http.client.HTTPException):
+            if should_stop and should_stop():
+                raise GenerationCancelled()
+            raise
+        finally:
+            done.set()
+            # closing mid-stream makes the server stop generating
+            connection.close()
+
+    def release_state(self):
+        # the server frees its own state when the connection closes
+        if self._local is not None:
+            self._local.release_state()
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--port", type=int, help="port to listen on (default: the server_port setting)"
+    )
+
+
+def main(args):
+    from llm.model import LanguageModel
+    from utils.defaults import default_server_port
+    from utils.storage import fetch_data
+
+    port = args.port or fetch_data("settings.json", "server_port", default_server_port)
+    if server_running(port):
+        print(f"A server is already running on port {port}")
+        return
+    print("Loading language model")
+    model = LanguageModel()
+    server = InferenceServer(port, model)
+    print(f"Serving {model.model_id} on http://{HOST}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
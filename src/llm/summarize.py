@@ -0,0 +1,166 @@
+"""
+Map-reduce summarization for transcripts that do not fit in the context window.
+
+The transcript is split into token-bounded chunks at line boundaries and each
+chunk is summarized on its own (map). If the summaries together are still too
+long they are grouped and summarized again, until they fit. The result takes
+the transcript's place in the final prompt, which applies the template (reduce).
+Chunk summaries are cached by content, so running the same transcript with a
+different template only repeats the final step.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from llm.context import CHAT_OVERHEAD
+from utils.metrics import LatencyTracker
+
+
+class GenerationCancelled(Exception):
+    """Raised when a request is cancelled before its answer is complete."""
+
+
+class MapReduceSummarizer:
+    """
+    Args:
+        model: A LoadedModel, used for token counting and completions.
+        cache_size: Number of chunk summaries kept in memory.
+    """
+
+    def __init__(self, model, cache_size: int = 512):
+        self.model = model
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # generated chunk summaries, and whole condense calls
+        self.chunk_latency = LatencyTracker()
+        self.condense_latency = LatencyTracker()
+
+    def split(self, text: str, max_tokens: int):
+        """
+        Returns:
+            list: Pieces of text of at most max_tokens tokens, cut between lines
+            where possible.
+        """
+        chunks, current, current_tokens = [], [], 0
+        for line in text.split("\n"):
+            line_tokens = self.model.tokenize(line + "\n")
+            if current and current_tokens + len(line_tokens) > max_tokens:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            if len(line_tokens) > max_tokens:
+                # a single line longer than a chunk is cut at token boundaries
+                for start in range(0, len(line_tokens), max_tokens):
+                    chunks.append(
+                        self.model.detokenize(line_tokens[start : start + max_tokens])
+                    )
+                continue
+            current.append(line)
+            current_tokens += len(line_tokens)
+        if current and any(line.strip() for line in current):
+            chunks.append("\n".join(current))
+        return chunks
+
+    def _key(self, prompt: str, chunk: str):
+        digest = hashlib.sha256()
+        for part in (self.model.model_id, prompt, chunk):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def summarize_chunk(
+        self, prompt: str, chunk: str, max_tokens: int, should_stop=None
+    ) -> str:
+        key = self._key(prompt, chunk)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+        if should_stop and should_stop():
+            raise GenerationCancelled()
+        start = time.perf_counter()
+        summary = self.model.complete(
+            prompt, chunk, max_tokens, should_stop=should_stop
+        ).strip()
+        self.chunk_latency.add(time.perf_counter() - start)
+        with self._lock:
+            self._cache[key] = summary
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return summary
+
+    def condense(
+        self,
+        transcription: str,
+        max_tokens: int,
+        prompt: str,
+        chunk_tokens: int,
+        summary_tokens: int,
+        workers: int = 1,
+        should_stop=None,
+    ) -> str:
+        """
+        Summarize transcription until it fits in max_tokens.
+
+        Args:
+            chunk_tokens: Size of the pieces each summary is made from.
+            summary_tokens: Maximum length of each summary.
+            workers: Chunks summarized at the same time. One in-process llama.cpp
+                context decodes a single sequence, so this only helps backends
+                that serve several requests at once.
+            should_stop: Called between chunks and tokens, GenerationCancelled
+                is raised once it returns True.
+        """
+        # the chunk, the prompt and the summary have to share one context
+        chunk_tokens = min(
+            chunk_tokens,
+            self.model.context_size
+            - summary_tokens
+            - len(self.model.tokenize(prompt))
+            - CHAT_OVERHEAD,
+        )
+        start = time.perf_counter()
+        text = transcription
+        while len(self.model.tokenize(text)) > max_tokens:
+            chunks = self.split(text, chunk_tokens)
+            if workers > 1 and len(chunks) > 1:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    summaries = list(
+                        pool.map(
+                            lambda chunk: self.summarize_chunk(
+                                prompt, chunk, summary_tokens, should_stop
+                            ),
+                            chunks,
+                        )
+                    )
+            else:
+                summaries = [
+                    self.summarize_chunk(prompt, chunk, summary_tokens, should_stop)
+                    for chunk in chunks
+                ]
+            condensed = "\n\n".join(summary for summary in summaries if summary)
+            stalled = len(chunks) == 1 or len(condensed) >= len(text)
+            text = condensed
+            if stalled:
+                # no further progress, the context packer trims what is left
+                break
+        self.condense_latency.add(time.perf_counter() - start)
+        return text
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "cached": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+        stats["chunk_summaries"] = self.chunk_latency.stats()
+        stats["condense"] = self.condense_latency.stats()
+        return stats
@@ -0,0 +1,136 @@
+"""
+On-disk cache of finished LLM summaries.
+
+A summary is stored under a hash of everything that went into it: the model,
+the system prompt, the query template, the summary template, the notes and the
+transcription. Running the same template on an unchanged note returns the
+stored text straight away instead of generating it again. Entries are evicted
+least recently used first once the cache goes over its size.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+def summary_key(*parts: str | None) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SummaryCache:
+    """
+    Args:
+        directory: Where summaries are stored, one file per summary.
+        max_bytes: Capacity of the cache, 0 to disable it.
+        evict: Whether to remove the oldest entries once over capacity. When
+            several processes add to the same directory, only one should.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, evict: bool = True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.evict = evict
+        self._entries = OrderedDict()  # key -> size, oldest first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.seconds_saved = 0.0
+        if max_bytes:
+            os.makedirs(directory, exist_ok=True)
+            self._load_index()
+            with self._lock:
+                self._trim()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".json")
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                entries.append((os.path.getmtime(path), name, os.path.getsize(path)))
+            except OSError:
+                continue
+        for _, name, size in sorted(entries):
+            self._entries[name[: -len(".json")]] = size
+
+    def size(self) -> int:
+        return sum(self._entries.values())
+
+    def get(self, key: str) -> str | None:
+        """
+        Returns:
+            str | None: The stored summary, or None if there is none.
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                os.utime(path)
+            except (OSError, ValueError) as e:
+                print(f"Error reading summary cache: {e}")
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.bytes_saved += len(entry["summary"].encode("utf-8"))
+            self.seconds_saved += entry.get("seconds", 0.0)
+            return entry["summary"]
+
+    def put(self, key: str, summary: str, seconds: float = 0.0):
+        """Store a summary that took seconds to generate."""
+        if not self.max_bytes:
+            return
+        with self._lock:
+            path = self._path(key)
+            tmp_path = path + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"summary": summary, "seconds": seconds}, f)
+                os.replace(tmp_path, path)
+                size = os.path.getsize(path)
+            except OSError as e:
+                print(f"Error writing summary cache: {e}")
+                return
+            self._entries.pop(key, None)
+            self._entries[key] = size
+            self._trim()
+
+    def _trim(self):
+        while self.evict and self._entries and self.size() > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        self._entries.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "mb": self.size() / (1 << 20),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "seconds_saved": self.seconds_saved,
+            }
@@ -1,22 +1,76 @@
+import argparse
+import multiprocessing
 import os
+import sys
+import time
 from dotenv import load_dotenv
-from audio.Transcriber import Transcriber
-from app import RichNoteTakingApp
-from llm.model import LanguageModel
 from utils import resource_path
 
+COMMANDS = {
+    "transcribe": "Transcribe recorded WAV files without the UI",
+    "summarize": "Summarize notes with a template without the UI",
+    "serve": "Serve the language model to other Note Taker processes",
+}
 
-if __name__ == "__main__":
-    print("Starting Note Taker")
 
-    load_dotenv(resource_path.resource_path(".env"))
+def command_module(command: str):
+    """
+    Returns:
+        module: The module running command, imported only when it is selected
+        because they load the models.
+    """
+    if command == "transcribe":
+        from audio import batch_transcription
+
+        return batch_transcription
+    if command == "summarize":
+        from llm import batch_summarization
+
+        return batch_summarization
+    from llm import server
+
+    return server
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Locaal AI Note Taker")
+    subparsers = parser.add_subparsers(dest="command")
+    # the command is the first argument, only its own options are added
+    selected = sys.argv[1] if len(sys.argv) > 1 else None
+    for command, description in COMMANDS.items():
+        subparser = subparsers.add_parser(command, help=description)
+        if command == selected:
+            command_module(command).add_arguments(subparser)
+    return parser.parse_args()
+
+
+def run_app():
+    start = time.perf_counter()
+    from utils.model_loader import start_loading
 
-    Transcriber()  # Warm up the Transcriber
-    LanguageModel()  # Warm up the LLM
+    # the models load in the background while the UI comes up
+    start_loading()
 
-    app = RichNoteTakingApp()
+    from app import RichNoteTakingApp
+
+    app = RichNoteTakingApp(start_time=start)
     app.title = "Locaal AI Note Taker"
     # get the version from the .env file
     version = os.getenv("LOCAL_RELEASE_TAG")
     app.sub_title = f"Version: {version}"
     app.run()
+
+
+if __name__ == "__main__":
+    # needed for the transcription process pool in the frozen app
+    multiprocessing.freeze_support()
+
+    print("Starting Note Taker")
+
+    load_dotenv(resource_path.resource_path(".env"))
+
+    args = parse_args()
+    if args.command:
+        command_module(args.command).main(args)
+    else:
+        run_app()
@@ -1,9 +1,16 @@
 import os
-import json
+import glob
+import time
 import uuid
 import platformdirs
+from notes.metadata_store import open_metadata_store
+from notes.transcript_log import TranscriptLog, compact_log
 from utils.storage import fetch_data, subscribe_to_data
-from utils.defaults import default_storage_folder
+from utils.defaults import default_metadata_backend, default_storage_folder
+
+# separates the typed notes from the transcription in a saved live note
+TRANSCRIPTION_HEADING = "\n\n# Transcription\n\n"
+AI_SUMMARY_HEADING = "\n\n# AI Summary\n\n"
 
 
 class NoteManager:
@@ -19,10 +26,11 @@ class NoteManager:
             return
         self.notes_directory = None
         self.notes = {}
+        self.store = None
         self.get_notes_directory()
         self.selected_note: dict | None = None
         self._initialized = True
-        self._load_json_store()
+        self._load_store()
 
     def get_notes_directory(self):
         """
@@ -44,7 +52,6 @@ class NoteManager:
         except Exception as e:
             print(f"Error creating notes directory: {e}")
             return
-        self.json_file = os.path.join(self.notes_directory, "notes.json")
         return self.notes_directory
 
     def set_notes_directory(self, new_notes_directory):
@@ -56,25 +63,43 @@ class NoteManager:
             print(f"Error creating notes directory: {e}")
             self.notes_directory = None
             return
-        self.json_file = os.path.join(self.notes_directory, "notes.json")
-        self._load_json_store()
+        self._load_store()
 
-    def _load_json_store(self):
-        if not hasattr(self, "json_file"):
+    def _load_store(self):
+        if not self.notes_directory or not os.path.isdir(self.notes_directory):
             print("Notes directory not set")
             return
-        if os.path.exists(self.json_file):
-            with open(self.json_file, "r") as f:
-                self.notes = json.load(f)
-        else:
-            self.notes = {}
+        if self.store:
+            self.store.close()
+        self.store = open_metadata_store(
+            fetch_data("settings.json", "metadata_backend", default_metadata_backend),
+            self.notes_directory,
+        )
+        self.notes = self.store.load()
+        self._recover_transcript_logs()
+
+    def _recover_transcript_logs(self):
+        # logs left behind by sessions that did not end cleanly
+        for uuid in self.notes:
+            log_path = self.get_transcript_log_path(uuid)
+            if not os.path.exists(log_path):
+                continue
+            try:
+                compact_log(log_path, self.get_transcription_path(uuid))
+                print(f"Recovered transcription for note {uuid}")
+            except Exception as e:
+                print(f"Error recovering transcription for note {uuid}: {e}")
 
-    def _save_json_store(self):
-        if not hasattr(self, "json_file"):
+    def _save_note(self, uuid):
+        if self.store is None:
             print("Notes directory not set")
             return
-        with open(self.json_file, "w") as f:
-            json.dump(self.notes, f, indent=2)
+        self.store.put(self.notes[uuid])
+
+    def _touch_note(self, uuid, path):
+        self.notes[uuid]["updated_at"] = os.path.getmtime(path)
+        if self.store:
+            self.store.touch(uuid, self.notes[uuid]["updated_at"])
 
     def select_note_by_uuid(self, uuid):
         if uuid in self.notes:
@@ -95,6 +120,30 @@ class NoteManager:
             return None
         return os.path.join(self.notes_directory, f"{uuid}.txt")
 
+    def get_transcription_path(self, uuid):
+        return os.path.join(self.notes_directory, f"{uuid}_transcription.txt")
+
+    def get_transcript_log_path(self, uuid):
+        return os.path.join(self.notes_directory, f"{uuid}_transcription.log")
+
+    def get_recording_path(self, uuid, extension="wav"):
+        """
+        Returns:
+            str: A new recording path for the note, named after the current time
+            so that earlier sessions are kept.
+        """
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
+        return os.path.join(
+            self.notes_directory, f"{uuid}_{timestamp}_recording.{extension}"
+        )
+
+    def list_recordings(self, uuid):
+        return sorted(
+            glob.glob(
+                os.path.join(glob.escape(self.notes_directory), f"{uuid}_*_recording.*")
+            )
+        )
+
     def create_note(self, title, content) -> str:
         note_uuid = str(uuid.uuid4())
         note_path = self.get_note_path_from_uuid(note_uuid)
@@ -110,7 +159,7 @@ class NoteManager:
             "created_at": os.path.getmtime(note_path),
             "updated_at": os.path.getmtime(note_path),
         }
-        self._save_json_store()
+        self._save_note(note_uuid)
         return note_uuid
 
     def read_note(self, uuid):
@@ -124,8 +173,8 @@ class NoteManager:
         if uuid not in self.notes:
             raise KeyError("Note not found")
         self.notes[uuid]["title"] = new_title
-        self._save_json_store()
         self.notes[uuid]["updated_at"] = os.path.getmtime(self.notes[uuid]["path"])
+        self._save_note(uuid)
 
     def update_note_content(self, uuid, new_content):
         if uuid not in self.notes:
@@ -133,7 +182,7 @@ class NoteManager:
         note_path = self.notes[uuid]["path"]
         with open(note_path, "w") as file:
             file.write(new_content)
-        self.notes[uuid]["updated_at"] = os.path.getmtime(note_path)
+        self._touch_note(uuid, note_path)
 
     def update_note_transcription(self, uuid: str, new_transcription: str):
         if not hasattr(self, "notes_directory") or self.notes_directory is None:
@@ -142,12 +191,32 @@ class NoteManager:
         if uuid not in self.notes:
             raise KeyError("Note not found")
         # create a new file with the transcription with "_transcription" appended to the uuid
-        transcription_path = os.path.join(
-            self.notes_directory, f"{uuid}_transcription.txt"
-        )
+        transcription_path = self.get_transcription_path(uuid)
         with open(transcription_path, "w") as file:
             file.write(new_transcription)
-        self.notes[uuid]["updated_at"] = os.path.getmtime(transcription_path)
+        self._touch_note(uuid, transcription_path)
+
+    def open_transcript_log(self, uuid: str) -> TranscriptLog | None:
+        """
+        Start logging a live transcription session. The transcription file is
+        written from the log by close_transcript_log() when the session ends.
+        """
+        if not hasattr(self, "notes_directory") or self.notes_directory is None:
+            print("Notes directory not set")
+            return None
+        if uuid not in self.notes:
+            raise KeyError("Note not found")
+        log_path = self.get_transcript_log_path(uuid)
+        if os.path.exists(log_path):
+            # a log from an earlier session that was never compacted
+            compact_log(log_path, self.get_transcription_path(uuid))
+        return TranscriptLog(log_path)
+
+    def close_transcript_log(self, uuid: str, log: TranscriptLog):
+        transcription_path = self.get_transcription_path(uuid)
+        log.compact(transcription_path)
+        if uuid in self.notes:
+            self._touch_note(uuid, transcription_path)
 
     def delete_note(self, uuid: str):
         if not hasattr(self, "notes_directory") or self.notes_directory is None:
@@ -158,13 +227,25 @@ class NoteManager:
         note_path = self.notes[uuid]["path"]
         if os.path.exists(note_path):
             os.remove(note_path)
-        transcription_path = os.path.join(
-            self.notes_directory, f"{uuid}_transcription.txt"
-        )
-        if os.path.exists(transcription_path):
-            os.remove(transcription_path)
+        for path in [
+            self.get_transcription_path(uuid),
+            self.get_transcript_log_path(uuid),
+            *self.list_recordings(uuid),
+        ]:
+            if os.path.exists(path):
+                os.remove(path)
         del self.notes[uuid]
-        self._save_json_store()
+        if self.store:
+            self.store.delete(uuid)
+
+    def notes_changed_since(self, timestamp: float):
+        """
+        Returns:
+            list: uuids of the notes updated at or after timestamp, newest first.
+        """
+        if self.store is None:
+            return []
+        return self.store.changed_since(timestamp)
 
     def list_notes(self, sort_by_date=False):
         notes_list = list(self.notes.values())
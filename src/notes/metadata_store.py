@@ -0,0 +1,263 @@
+"""
+Where NoteManager keeps note metadata (title, path and timestamps).
+
+JsonMetadataStore is the original notes.json file, rewritten whole on every
+change. SqliteMetadataStore keeps one row per note in notes.db, so creating,
+renaming or deleting a note writes a single row however many notes there are.
+notes.json is merged into notes.db, and JsonMetadataStore takes notes.db over
+when it was changed last, so the backend can be switched without losing notes.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+# metadata keys with a column of their own, anything else is kept as JSON
+COLUMNS = ["uuid", "title", "path", "created_at", "updated_at"]
+
+
+def _modified(path: str) -> float:
+    """
+    Returns:
+        float: When path or its SQLite write-ahead log last changed, 0 if missing.
+    """
+    times = []
+    for name in (path, path + "-wal"):
+        try:
+            times.append(os.path.getmtime(name))
+        except OSError:
+            pass
+    return max(times, default=0.0)
+
+
+class JsonMetadataStore:
+    """
+    Args:
+        directory: The notes directory, the metadata is kept in notes.json.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.path = os.path.join(directory, "notes.json")
+        self._notes = {}
+        self._touched = False
+
+    def load(self) -> dict:
+        """
+        Returns:
+            dict: uuid -> metadata of every note.
+        """
+        if _modified(os.path.join(self.directory, "notes.db")) > _modified(self.path):
+            # notes.db was used last, carry on with its notes
+            store = SqliteMetadataStore(self.directory)
+            self._notes = store.load()
+            store.close()
+            self._save()
+        elif os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                self._notes = json.load(f)
+        else:
+            self._notes = {}
+        return dict(self._notes)
+
+    def _save(self):
+        with open(self.path, "w") as f:
+            json.dump(self._notes, f, indent=2)
+        self._touched = False
+
+    def put(self, note: dict):
+        self._notes[note["uuid"]] = note
+        self._save()
+
+    def touch(self, uuid: str, updated_at: float):
+        # timestamps only change in memory, notes.json is not rewritten for them
+        if uuid in self._notes:
+            self._notes[uuid]["updated_at"] = updated_at
+            self._touched = True
+
+    def delete(self, uuid: str):
+        self._notes.pop(uuid, None)
+        self._save()
+
+    def changed_since(self, timestamp: float) -> list:
+        """
+        Returns:
+            list: uuids of the notes updated at or after timestamp, newest first.
+        """
+        notes = [
+            note
+            for note in self._notes.values()
+            if note.get("updated_at", note.get("created_at", 0)) >= timestamp
+        ]
+        notes.sort(
+            key=lambda note: note.get("updated_at", note.get("created_at", 0)),
+            reverse=True,
+        )
+        return [note["uuid"] for note in notes]
+
+    def close(self):
+        if self._touched:
+            self._save()
+
+
+class SqliteMetadataStore:
+    """
+    Args:
+        directory: The notes directory, the metadata is kept in notes.db.
+    """
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, "notes.db")
+        self.json_path = os.path.join(directory, "notes.json")
+        # NoteManager is used from the UI and from worker threads
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # with WAL, a crash can lose the last commits but never corrupts the file
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS notes ("
+                "uuid TEXT PRIMARY KEY, title TEXT NOT NULL, path TEXT NOT NULL, "
+                "created_at REAL, updated_at REAL, extra TEXT)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)"
+            )
+            # what each note looked like in notes.json when it was last imported
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS imported (uuid TEXT PRIMARY KEY, hash TEXT)"
+            )
+            for column in ("updated_at", "created_at", "title"):
+                self._db.execute(
+                    f"CREATE INDEX IF NOT EXISTS notes_{column} ON notes({column})"
+                )
+        self._import_json()
+
+    def _import_json(self):
+        """
+        Merge the notes in notes.json into notes.db if it changed since the last import.
+
+        Notes whose entry in notes.json is unchanged since they were last imported are
+        skipped, so edits made in notes.db are kept, and an entry only replaces a row
+        that was not updated after it. Rows are never dropped because notes.json lacks
+        them, only when their note file was deleted as well.
+        """
+        modified = _modified(self.json_path)
+        if not modified:
+            return
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM meta WHERE key = 'json_modified'"
+            ).fetchone()
+        if row and row[0] >= modified:
+            return
+        try:
+            with open(self.json_path, "r") as f:
+                notes = json.load(f)
+            notes = list(notes.values())
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"Error reading notes.json: {e}")
+            return
+        rows = []
+        for note in notes:
+            try:
+                rows.append(self._row(note))
+            except (KeyError, TypeError, AttributeError):
+                print(f"Skipping note without a uuid, title or path: {note}")
+        merged = 0
+        with self._lock, self._db:
+            imported = dict(self._db.execute("SELECT uuid, hash FROM imported"))
+            current = {
+                row[0]: row
+                for row in self._db.execute("SELECT uuid, path, updated_at FROM notes")
+            }
+            for row in rows:
+                digest = hashlib.sha1(repr(row).encode()).hexdigest()
+                if imported.get(row[0]) == digest:
+                    continue
+                stored = current.get(row[0])
+                if stored is None or (stored[2] or 0) <= (row[4] or 0):
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO notes VALUES (?, ?, ?, ?, ?, ?)", row
+                    )
+                    merged += 1
+                self._db.execute(
+                    "INSERT OR REPLACE INTO imported VALUES (?, ?)", (row[0], digest)
+                )
+            # deleted with the json backend, a stale copy of notes.json keeps the file
+            listed = {row[0] for row in rows}
+            for uuid, path, _ in current.values():
+                if uuid not in listed and not os.path.exists(path):
+                    self._db.execute("DELETE FROM notes WHERE uuid = ?", (uuid,))
+                    self._db.execute("DELETE FROM imported WHERE uuid = ?", (uuid,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('json_modified', ?)", (modified,)
+            )
+        print(f"Merged {merged} of {len(notes)} notes from notes.json")
+
+    def _row(self, note: dict):
+        extra = {key: value for key, value in note.items() if key not in COLUMNS}
+        return (
+            note["uuid"],
+            note["title"],
+            note["path"],
+            note.get("created_at"),
+            note.get("updated_at"),
+            json.dumps(extra) if extra else None,
+        )
+
+    def _note(self, row) -> dict:
+        note = {
+            column: value
+            for column, value in zip(COLUMNS, row[: len(COLUMNS)])
+            if value is not None
+        }
+        if row[len(COLUMNS)]:
+            note.update(json.loads(row[len(COLUMNS)]))
+        return note
+
+    def load(self) -> dict:
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM notes").fetchall()
+        return {row[0]: self._note(row) for row in rows}
+
+    def put(self, note: dict):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO notes VALUES (?, ?, ?, ?, ?, ?)",
+                self._row(note),
+            )
+
+    def touch(self, uuid: str, updated_at: float):
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE notes SET updated_at = ? WHERE uuid = ?", (updated_at, uuid)
+            )
+
+    def delete(self, uuid: str):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM notes WHERE uuid = ?", (uuid,))
+
+    def changed_since(self, timestamp: float) -> list:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT uuid FROM notes WHERE updated_at >= ? "
+                "ORDER BY updated_at DESC",
+                (timestamp,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+METADATA_STORES = {"json": JsonMetadataStore, "sqlite": SqliteMetadataStore}
+
+
+def open_metadata_store(backend: str, directory: str):
+    """Open the named backend, falling back to SQLite for unknown names."""
+    return METADATA_STORES.get(backend, SqliteMetadataStore)(directory)
@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+import time
+
+
+class TranscriptLog:
+    """
+    Append-only record of a live transcription session, one JSON object per line.
+
+    Every partial and final result is appended as it arrives, so the cost of
+    persisting a session grows with its length instead of with its square. The
+    file is flushed on every record and fsynced at most every fsync_interval
+    seconds. A log that is still on disk when the app starts belongs to a session
+    that did not end cleanly and is recovered with read_records().
+    """
+
+    def __init__(self, path: str, fsync_interval: float = 2.0):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._last_sync = time.monotonic()
+        _drop_torn_record(path)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def append(
+        self, chunk_id: int, text: str, start: float, end: float, is_partial: bool
+    ):
+        """
+        Args:
+            chunk_id: Id of the audio chunk the text was decoded from.
+            start, end: Segment timestamps in milliseconds, relative to the chunk.
+        """
+        record = {
+            "chunk": chunk_id,
+            "start": start,
+            "end": end,
+            "text": text,
+            "partial": is_partial,
+            "time": time.time(),
+        }
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            if time.monotonic() - self._last_sync >= self.fsync_interval:
+                os.fsync(self._file.fileno())
+                self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def compact(self, text_path: str):
+        """Write the transcript text to text_path and remove the log."""
+        self.close()
+        compact_log(self.path, text_path)
+
+
+def _drop_torn_record(path):
+    # a crash in the middle of a write leaves a partial last line behind
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as file:
+        data = file.read()
+        if data and not data.endswith(b"\n"):
+            file.truncate(data.rfind(b"\n") + 1)
+
+
+def read_records(path: str):
+    """
+    Returns:
+        list: The records in the log, skipping any that cannot be parsed.
+    """
+    records = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def transcript_text(records) -> str:
+    """
+    Join the final results in order. A partial that arrived after the last final
+    is kept as well, it is all that is left of the audio after it.
+    """
+    lines = [record["text"] for record in records if not record["partial"]]
+    if records and records[-1]["partial"] and records[-1]["text"]:
+        lines.append(records[-1]["text"])
+    return "\n".join(lines)
+
+
+def compact_log(log_path: str, text_path: str):
+    text = transcript_text(read_records(log_path))
+    temp_path = text_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write(text)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, text_path)
+    os.remove(log_path)
@@ -1,4 +1,8 @@
+import asyncio
 import datetime
+import queue
+import time
+from collections import deque
 import pyperclip
 
 from textual.widgets import Static
@@ -8,8 +12,10 @@ from textual.binding import Binding
 from textual import work
 from textual.reactive import reactive
 
-from llm.model import LanguageModel
-from notes.manager import NoteManager
+from llm.jobs import generation_queue, GenerationJob, CANCELLED
+from notes.manager import AI_SUMMARY_HEADING, TRANSCRIPTION_HEADING, NoteManager
+from utils.metrics import LatencyTracker
+from utils.model_loader import language_model_loader
 
 from audio.textual_transcription_textarea import TranscriptionTextArea
 from template_select_modal import TemplateSelectModal
@@ -25,6 +31,8 @@ class NoteTextArea(TextArea):
         self.content = content
         self.uuid = uuid
         self.text = self.content
+        self.streaming = False
+        self.stream_buffer = deque()
 
     def on_mount(self):
         if self.text and len(self.text) > 0:
@@ -32,13 +40,58 @@ class NoteTextArea(TextArea):
             self.cursor_location = (len(lines) - 1, len(lines[-1]))
 
     def on_text_area_changed(self, changed: TextArea.Changed):
+        if self.streaming:
+            # saved once when the stream ends
+            return
         self.note_manager.update_note_content(self.uuid, changed.text_area.text)
 
+    def begin_stream(self, frame_rate: float = 30):
+        """
+        Start appending streamed text at the end of the note. Text passed to
+        stream() is buffered and inserted once per frame.
+        """
+        self.streaming = True
+        self.stream_tokens = 0
+        self.stream_start = time.perf_counter()
+        self.frame_time = LatencyTracker()
+        self.stream_timer = self.set_interval(1 / max(frame_rate, 1), self.flush_stream)
+
+    def stream(self, text: str):
+        """Queue text for insertion. Safe to call from any thread."""
+        self.stream_buffer.append(text)
+
+    def flush_stream(self):
+        chunks = []
+        while self.stream_buffer:
+            chunks.append(self.stream_buffer.popleft())
+        if not chunks:
+            return
+        start = time.perf_counter()
+        self.insert("".join(chunks), self.document.end)
+        self.frame_time.add(time.perf_counter() - start)
+        self.stream_tokens += len(chunks)
+
+    def end_stream(self):
+        """
+        Insert what is left, save the note and return generation stats.
+        """
+        self.stream_timer.stop()
+        self.flush_stream()
+        self.streaming = False
+        self.note_manager.update_note_content(self.uuid, self.text)
+        elapsed = time.perf_counter() - self.stream_start
+        return {
+            "tokens": self.stream_tokens,
+            "seconds": elapsed,
+            "tokens_per_second": self.stream_tokens / max(elapsed, 1e-9),
+            "frame_time": self.frame_time.stats(),
+        }
+
 
 class NoteEditScreen(Screen):
     BINDINGS = [
         ("escape", "quit", "Quit"),
-        Binding("ctrl+l", "run_llm", "Run LLM", show=True, priority=True),
+        Binding("ctrl+l", "run_llm", "Run/Cancel LLM", show=True, priority=True),
         Binding("ctrl+o", "clipboard", "Copy to Clipboard", show=True, priority=True),
     ]
 
@@ -66,26 +119,88 @@ class NoteEditScreen(Screen):
 
     def action_quit(self):
         self.app.notify("Note Saved", timeout=1)
-        new_content = self.query_one("#note_text").text
+        textArea = self.query_one("#note_text")
+        job = generation_queue.job_for(self.uuid)
+        if job and job.active():
+            # let the generation finish in the background and append the rest
+            # of it to the saved note
+            delivered = job.detach()
+            textArea.end_stream()
+            job.future.add_done_callback(
+                lambda future: self.append_generated(job, delivered)
+            )
+        new_content = textArea.text
         self.note_manager.update_note_content(self.uuid, new_content)
         self.dismiss()
 
+    def append_generated(self, job: GenerationJob, start: int):
+        """Add text generated after the editor was closed to the note file."""
+        remaining = job.text(start)
+        if not remaining:
+            return
+        content = self.note_manager.read_note(self.uuid)
+        self.note_manager.update_note_content(self.uuid, content + remaining)
+
     @work
     async def action_run_llm(self):
+        job = generation_queue.job_for(self.uuid)
+        if job and job.active():
+            job.cancel()
+            self.app.notify("Cancelling LLM")
+            return
+
         template_modal = TemplateSelectModal()
         result = await self.app.push_screen_wait(template_modal)
         # read the template content
 
         if result and result[0]:
-            self.app.notify("Running LLM")
             textArea = self.query_one("#note_text")
-            note_content = textArea.text
-            textArea.text += f"\n\n# AI Summary\n\n"
-            for response in LanguageModel().generate_response(
-                note_content, template=result[1]
-            ):
-                self.log.info(response)
-                textArea.text += response
+            note_content, _, transcription = textArea.text.partition(
+                TRANSCRIPTION_HEADING
+            )
+            # an earlier summary follows the transcription, leave it out
+            transcription = transcription.split(AI_SUMMARY_HEADING)[0]
+            job = GenerationJob(
+                self.uuid,
+                note_content,
+                transcription,
+                result[1],
+                on_token=textArea.stream,
+            )
+            try:
+                generation_queue.submit(job)
+            except queue.Full:
+                self.app.notify("Too many LLM requests waiting", severity="warning")
+                return
+            except ValueError as e:
+                self.app.notify(str(e), severity="warning")
+                return
+            if not language_model_loader.ready():
+                self.app.notify("The LLM will run once the model has loaded")
+            elif generation_queue.pending():
+                self.app.notify("LLM request queued")
+            else:
+                self.app.notify("Running LLM")
+            textArea.begin_stream()
+            textArea.insert(AI_SUMMARY_HEADING, textArea.document.end)
+
+            try:
+                # tokens arrive from the inference thread while we wait
+                await asyncio.wrap_future(job.future)
+            except Exception as e:
+                self.app.notify(f"Error running the LLM: {e}", severity="error")
+                return
+            finally:
+                if textArea.streaming:
+                    stats = textArea.end_stream()
+                    self.log.info(f"LLM stream: {stats}")
+            if job.state == CANCELLED:
+                self.app.notify("Cancelled LLM")
+                return
+            self.app.notify(
+                f"LLM done: {stats['tokens_per_second']:.1f} tokens/s, "
+                f"frame p95 {stats['frame_time'].get('p95_ms', 0):.1f} ms"
+            )
         else:
             self.app.notify("Cancelled LLM")
 
@@ -123,6 +238,6 @@ class LiveNoteEditScreen(Screen):
         self.app.notify("Note Saved")
         note_content = self.query_one("#note_text").text
         transcription = self.query_one("#Transcription").text
-        combined = f"{note_content}\n\n# Transcription\n\n{transcription}"
+        combined = f"{note_content}{TRANSCRIPTION_HEADING}{transcription}"
         self.note_manager.update_note_content(self.uuid, combined)
         self.dismiss()
@@ -7,9 +7,13 @@ from textual.binding import Binding
 from notes.manager import default_storage_folder
 from utils.helpers import open_folder_with_finder
 from utils.storage import get_data_dir, store_data, fetch_data
-from utils.defaults import default_system_prompt, default_model, default_query_template
+from utils.defaults import (
+    default_system_prompt,
+    default_model,
+    default_query_template,
+    default_whisper_model,
+)
 from utils.resource_path import resource_path
-from huggingface_hub import list_repo_files
 import re
 
 
@@ -38,6 +42,9 @@ def find_q4_model_file(repo_id):
     Returns:
         str: Filename of the Q4 model if found, None otherwise
     """
+    # huggingface_hub is slow to import, keep it off the startup path
+    from huggingface_hub import list_repo_files
+
     try:
         # List all files in the repository
         files = list_repo_files(repo_id)
@@ -74,7 +81,7 @@ class SettingsScreen(ModalScreen):
         )
         self.current_model = fetch_data("settings.json", "model", default_model)
         self.current_whisper_model = fetch_data(
-            "settings.json", "whisper_model", "ggml-model-whisper-small-en-q5_1"
+            "settings.json", "whisper_model", default_whisper_model
         )
         self.storage_folder = fetch_data(
             "settings.json", "storage_folder", default_storage_folder
@@ -46,8 +46,38 @@ NOTES:
 - Maintain original template formatting only if they can be filled.
 - **Do not include or repeat the original notes or transcription verbatim in the final output.**
 """
-default_query_template = "{user_notes}"
+default_query_template = """[TEMPLATE]
+{template}
+[END_TEMPLATE]
+[USER_NOTES]
+{user_notes}
+[END_USER_NOTES]
+[TRANSCRIPTION]
+{transcription}
+[END_TRANSCRIPTION]"""
+default_chunk_summary_prompt = """
+You summarize one part of a longer meeting transcription.
+Write concise bullet points covering the topics discussed, decisions made, action items and owners, and any numbers, dates or names mentioned.
+Only use information from the transcription. Do not add an introduction or a conclusion.
+"""
 default_model = "bartowski/Llama-3.2-1B-Instruct-GGUF"
 default_model_file = "Llama-3.2-1B-Instruct-Q4_K_M.gguf"
 default_context_size = 8192
+default_output_reserve = 1024
+default_summary_chunk_tokens = 3072
+default_summary_tokens = 384
+default_prompt_cache_mb = 1024
+default_prompt_disk_cache_mb = 4096
+default_summary_cache_mb = 64
+default_server_port = 8642
+default_metadata_backend = "sqlite"
+default_whisper_model = "ggml-model-whisper-small-en-q5_1"
+default_whisper_partial_model = "ggml-model-whisper-tiny-en-q5_1"
+default_whisper_cache_mb = 1536
+default_chunk_min_duration = 1.0
+default_chunk_max_duration = 10.0
+default_chunk_pause_duration = 0.3
+default_chunk_overlap = 0.2
+default_transcript_frame_rate = 20
+default_recording_format = "wav"
 default_storage_folder = platformdirs.user_data_dir("notes", "NoteTakingApp")
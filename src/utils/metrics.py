@@ -0,0 +1,36 @@
+import threading
+from collections import deque
+
+
+class LatencyTracker:
+    """
+    Keeps the most recent latency samples and summarises them on request.
+    """
+
+    def __init__(self, window=500):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+            self.count += 1
+
+    def stats(self):
+        with self._lock:
+            samples = sorted(self.samples)
+            count = self.count
+        if not samples:
+            return {"count": count}
+
+        def percentile(fraction):
+            return samples[min(int(fraction * len(samples)), len(samples) - 1)]
+
+        return {
+            "count": count,
+            "mean_ms": 1000 * sum(samples) / len(samples),
+            "p50_ms": 1000 * percentile(0.5),
+            "p95_ms": 1000 * percentile(0.95),
+            "max_ms": 1000 * samples[-1],
+        }
@@ -0,0 +1,107 @@
+"""
+Loads the transcription and language models on background threads so the UI
+can come up right away. Anything that needs a model waits on its loader's
+future, which makes actions started before the model is ready run as soon as it
+has loaded.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable
+
+
+class ModelLoader:
+    """
+    Args:
+        name: Shown in the loading status.
+        load: Loads and returns the model. Called with a function it can use to
+            report what it is doing.
+    """
+
+    def __init__(self, name: str, load: Callable[[Callable[[str], None]], Any]):
+        self.name = name
+        self._load = load
+        self.future = Future()
+        self.status = "waiting"
+        self.load_time = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self) -> Future:
+        """Start loading if that has not happened yet."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return self.future
+
+    def _report(self, status: str):
+        self.status = status
+
+    def _run(self):
+        start = time.perf_counter()
+        self._report("loading")
+        try:
+            model = self._load(self._report)
+        except Exception as e:
+            self._report(f"failed: {e}")
+            self.future.set_exception(e)
+            return
+        self.load_time = time.perf_counter() - start
+        self._report("ready")
+        self.future.set_result(model)
+
+    def ready(self) -> bool:
+        return self.future.done() and self.future.exception() is None
+
+    def failed(self) -> bool:
+        return self.future.done() and self.future.exception() is not None
+
+    def get(self, timeout: float | None = None):
+        """Wait for the model. Raises the loading error if it failed."""
+        return self.start().result(timeout)
+
+
+def _load_transcriber(report):
+    from audio.model_registry import configured_model_name
+
+    report(f"loading {configured_model_name()}")
+    from audio.Transcriber import get_transcriber
+
+    return get_transcriber()
+
+
+def _load_language_model(report):
+    from huggingface_hub import try_to_load_from_cache
+    from llm.server import RemoteLanguageModel, server_running
+    from utils.defaults import default_model, default_model_file, default_server_port
+    from utils.storage import fetch_data
+
+    port = fetch_data("settings.json", "server_port", default_server_port)
+    if server_running(port):
+        # share the model another process is already serving
+        report(f"using the server on port {port}")
+        return RemoteLanguageModel(port)
+    repo_id = fetch_data("settings.json", "model", default_model)
+    filename = fetch_data("settings.json", "model_file", default_model_file)
+    cached = try_to_load_from_cache(repo_id, filename)
+    if isinstance(cached, str) and os.path.exists(cached):
+        report(f"loading {filename}")
+    else:
+        report(f"downloading {filename}")
+    from llm.model import LanguageModel
+
+    return LanguageModel()
+
+
+transcriber_loader = ModelLoader("Transcription", _load_transcriber)
+language_model_loader = ModelLoader("Language model", _load_language_model)
+loaders = [transcriber_loader, language_model_loader]
+
+
+def start_loading():
+    """Load all models in parallel."""
+    for loader in loaders:
+        loader.start()
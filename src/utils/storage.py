@@ -1,16 +1,176 @@
+import atexit
+import copy
+import functools
 import json
 import os
+import tempfile
+import threading
+import time
 from platformdirs import user_data_dir
 
-
 data_subscribers = {}
 
-
+# parsed JSON files, path -> (mtime and size, documents, time of the last check)
+_cache = {}
+_cache_lock = threading.RLock()
+_cache_counters = {"calls": 0, "hits": 0, "reloads": 0, "first_call": None}
+# how long fetch_data trusts the cache before checking the file again
+STAT_INTERVAL = 0.5
+# how often files with subscribers are checked for changes made elsewhere
+WATCH_INTERVAL = 1.0
+_watcher = None
+# changes within this window are written to disk together
+WRITE_DELAY = 0.5
+# a write that failed is tried again after this long
+RETRY_DELAY = 5.0
+_pending_writes = {}  # path -> timer that writes it
+# one file write at a time, so a later snapshot is never replaced by an older one
+_write_lock = threading.Lock()
+
+
+@functools.cache
 def get_data_dir():
     # Get the user data directory
     return user_data_dir("notes", "NoteTakingApp", ensure_exists=True)
 
 
+def _file_version(file_path):
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _notify(file_path, document_name, data):
+    for callback in data_subscribers.get(file_path, {}).get(document_name, []):
+        callback(data)
+
+
+def _documents(file_path, max_age=STAT_INTERVAL, count_hit=False):
+    """
+    Parsed contents of a JSON file, read again only when its modification time
+    or size changed. Subscribers are told about values changed by other
+    processes.
+
+    Returns:
+        dict | None: The documents, or None if the file does not exist.
+    """
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(file_path)
+        if entry and (now - entry[2] < max_age or file_path in _pending_writes):
+            # unwritten changes win over whatever is on disk
+            _cache_counters["hits"] += count_hit
+            return entry[1]
+        version = _file_version(file_path)
+        if entry and version == entry[0]:
+            _cache[file_path] = (version, entry[1], now)
+            _cache_counters["hits"] += count_hit
+            return entry[1]
+        documents = None
+        if version is not None:
+            try:
+                with open(file_path, "r") as f:
+                    documents = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                # most likely caught halfway through a write, try again next time
+                return entry[1] if entry else {}
+        _cache[file_path] = (version, documents, now)
+        _cache_counters["reloads"] += 1
+    if entry:
+        old, new = entry[1] or {}, documents or {}
+        for document_name in set(old) | set(new):
+            if old.get(document_name) != new.get(document_name):
+                _notify(file_path, document_name, new.get(document_name))
+    return documents
+
+
+def _write_documents(file_path, documents):
+    """Update the cached documents and write them to disk after WRITE_DELAY."""
+    with _cache_lock:
+        entry = _cache.get(file_path)
+        _cache[file_path] = (entry[0] if entry else None, documents, time.monotonic())
+        if file_path not in _pending_writes:
+            _schedule_write(file_path, WRITE_DELAY)
+
+
+def _schedule_write(file_path, delay):
+    # called with _cache_lock held
+    timer = threading.Timer(delay, _flush_file, args=(file_path,))
+    timer.daemon = True
+    _pending_writes[file_path] = timer
+    timer.start()
+
+
+def _flush_file(file_path):
+    with _write_lock:
+        with _cache_lock:
+            timer = _pending_writes.pop(file_path, None)
+            if timer is None:
+                # already written by an earlier flush
+                return
+            timer.cancel()
+            content = json.dumps(_cache[file_path][1], indent=2)
+        # write a temporary file and rename it over the old one, so a crash
+        # never leaves a half-written file behind
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, file_path)
+        except OSError as e:
+            print(f"Error writing {file_path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            with _cache_lock:
+                # keep the change and try again, unless a newer write is queued
+                if file_path not in _pending_writes:
+                    _schedule_write(file_path, RETRY_DELAY)
+            return
+        with _cache_lock:
+            version, documents, checked = _cache[file_path]
+            _cache[file_path] = (_file_version(file_path), documents, checked)
+
+
+def flush_data():
+    """Write all pending changes to disk now."""
+    with _cache_lock:
+        file_paths = list(_pending_writes)
+    for file_path in file_paths:
+        _flush_file(file_path)
+
+
+atexit.register(flush_data)
+
+
+def _watch():
+    while True:
+        time.sleep(WATCH_INTERVAL)
+        for file_path in list(data_subscribers):
+            try:
+                _documents(file_path, max_age=0)
+            except Exception as e:
+                print(f"Error checking {file_path} for changes: {e}")
+
+
+def cache_stats():
+    """
+    Returns:
+        dict: fetch_data calls, calls per second, cache hits and file reloads.
+    """
+    with _cache_lock:
+        counters = dict(_cache_counters)
+    first_call = counters.pop("first_call")
+    elapsed = time.monotonic() - first_call if first_call else 0
+    counters["calls_per_second"] = counters["calls"] / elapsed if elapsed else 0.0
+    return counters
+
+
 def subscribe_to_data(file_path: str, document_name: str, callback: callable):
     # Subscribe to data changes in a JSON file
     # prepend the user data directory
@@ -22,6 +182,12 @@ def subscribe_to_data(file_path: str, document_name: str, callback: callable):
         data_subscribers[file_path][document_name] = []
     data_subscribers[file_path][document_name].append(callback)
 
+    global _watcher
+    with _cache_lock:
+        if _watcher is None:
+            _watcher = threading.Thread(target=_watch, daemon=True)
+            _watcher.start()
+
 
 def store_data(file_path, document_name, data):
     # Store data into a JSON file
@@ -31,24 +197,13 @@ def store_data(file_path, document_name, data):
     # prepend the user data directory
     file_path = os.path.join(data_dir, file_path)
 
-    if os.path.exists(file_path):
-        with open(file_path, "r") as f:
-            try:
-                documents = json.load(f)
-            except json.JSONDecodeError:
-                documents = {}
-    else:
-        documents = {}
-
-    documents[document_name] = data
-
-    with open(file_path, "w") as f:
-        json.dump(documents, f, indent=2)
+    with _cache_lock:
+        documents = dict(_documents(file_path, max_age=0) or {})
+        documents[document_name] = copy.deepcopy(data)
+        _write_documents(file_path, documents)
 
     # notify subscribers
-    if file_path in data_subscribers and document_name in data_subscribers[file_path]:
-        for callback in data_subscribers[file_path][document_name]:
-            callback(data)
+    _notify(file_path, document_name, data)
 
 
 def remove_data(file_path, document_name):
@@ -56,22 +211,16 @@ def remove_data(file_path, document_name):
     # prepend the user data directory
     file_path = os.path.join(get_data_dir(), file_path)
 
-    if not os.path.exists(file_path):
-        return
-
-    with open(file_path, "r") as f:
-        documents = json.load(f)
-
-    if document_name in documents:
-        del documents[document_name]
+    with _cache_lock:
+        documents = _documents(file_path, max_age=0)
+        if documents is None:
+            return
+        documents = dict(documents)
+        documents.pop(document_name, None)
+        _write_documents(file_path, documents)
 
     # notify subscribers
-    if file_path in data_subscribers and document_name in data_subscribers[file_path]:
-        for callback in data_subscribers[file_path][document_name]:
-            callback(None)
-
-    with open(file_path, "w") as f:
-        json.dump(documents, f, indent=2)
+    _notify(file_path, document_name, None)
 
 
 def fetch_data(file_path, document_name, default=None):
@@ -79,16 +228,14 @@ def fetch_data(file_path, document_name, default=None):
     # prepend the user data directory
     file_path = os.path.join(get_data_dir(), file_path)
 
-    if not os.path.exists(file_path):
-        return default
-
-    with open(file_path, "r") as f:
-        try:
-            documents = json.load(f)
-        except json.JSONDecodeError:
-            return default
+    with _cache_lock:
+        _cache_counters["calls"] += 1
+        if _cache_counters["first_call"] is None:
+            _cache_counters["first_call"] = time.monotonic()
+    documents = _documents(file_path, count_hit=True)
 
-    if document_name in documents:
-        return documents[document_name]
+    if documents and document_name in documents:
+        # callers get their own copy, the cached documents stay as they are on disk
+        return copy.deepcopy(documents[document_name])
     else:
         return default
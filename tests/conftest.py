@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the app imports its modules from src, the way main.py is run
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
@@ -0,0 +1,81 @@
+from llm.context import CHAT_OVERHEAD, ELISION, ContextPacker, compress_text
+
+QUERY = "[TEMPLATE]{template}[END]\n{user_notes}\n[T]{transcription}[END]"
+SYSTEM = "You take notes."
+
+
+def packer():
+    # one token per character keeps the arithmetic exact
+    return ContextPacker(list, "".join)
+
+
+def fixed():
+    return len(SYSTEM) + len(QUERY.format(template="", user_notes="", transcription=""))
+
+
+def test_fixed_tokens_count_everything_but_the_fields():
+    assert packer().fixed_tokens(SYSTEM, QUERY) == fixed() + CHAT_OVERHEAD
+
+
+def test_everything_fits():
+    fields = {"template": "# Summary", "user_notes": "notes", "transcription": "hi"}
+    query, stats = packer().pack(SYSTEM, QUERY, fields, 1000, 100)
+    assert query == QUERY.format(**fields)
+    assert stats["prompt_tokens"] == fixed() + CHAT_OVERHEAD + 9 + 5 + 2
+    assert stats["dropped_tokens"] == 0
+    assert stats["trimmed"] == [] and stats["compressed"] == []
+
+
+def test_transcription_is_trimmed_first():
+    fields = {
+        "template": "T" * 50,
+        "user_notes": "N" * 50,
+        "transcription": "word " * 200,
+    }
+    context_size, reserve = 400, 100
+    query, stats = packer().pack(SYSTEM, QUERY, fields, context_size, reserve)
+    assert stats["prompt_tokens"] <= context_size - reserve
+    assert stats["field_tokens"]["template"] == 50
+    assert stats["field_tokens"]["user_notes"] == 50
+    assert stats["trimmed"] == ["transcription"]
+    assert ELISION in query
+    assert "T" * 50 in query and "N" * 50 in query
+
+
+def test_notes_are_cut_only_once_the_transcription_is_gone():
+    fields = {"template": "T" * 20, "user_notes": "N" * 500, "transcription": "x" * 100}
+    _, stats = packer().pack(SYSTEM, QUERY, fields, 400, 100)
+    assert stats["prompt_tokens"] <= 300
+    assert stats["field_tokens"]["transcription"] == 0
+    assert stats["field_tokens"]["template"] == 20
+    assert stats["trimmed"] == ["transcription", "user_notes"]
+
+
+def test_transcription_is_compressed_before_it_is_cut():
+    transcription = "um so we agreed\n" * 20
+    fields = {"template": "", "user_notes": "", "transcription": transcription}
+    budget = fixed() + CHAT_OVERHEAD + len(compress_text(transcription)) + 10
+    query, stats = packer().pack(SYSTEM, QUERY, fields, budget, 10)
+    assert stats["compressed"] == ["transcription"]
+    assert stats["trimmed"] == []
+    assert compress_text(transcription) in query
+
+
+def test_room_for_leaves_space_for_the_other_fields():
+    fields = {"template": "T" * 30, "user_notes": "N" * 70, "transcription": "x"}
+    room = packer().room_for("transcription", SYSTEM, QUERY, fields, 1000, 200)
+    assert room == 1000 - 200 - fixed() - CHAT_OVERHEAD - 100
+
+
+def test_cut_middle_keeps_both_ends():
+    text = "a" * 100 + "b" * 100
+    cut = packer().cut_middle(text, 50)
+    assert len(cut) <= 50
+    assert cut.startswith("a") and cut.endswith("b")
+    assert ELISION in cut
+    assert packer().cut_middle(text, 0) == ""
+    assert packer().cut_middle("short", 50) == "short"
+
+
+def test_compress_text_drops_fillers_and_repeats():
+    assert compress_text("um  hello\nhello\n\n\n\nuh, world") == "hello\n\nworld"
@@ -0,0 +1,122 @@
+import json
+import os
+import time
+
+import pytest
+
+from notes.metadata_store import (
+    JsonMetadataStore,
+    SqliteMetadataStore,
+    open_metadata_store,
+)
+
+
+def note(uuid, updated_at=1.0, directory="/notes", **extra):
+    return {
+        "uuid": uuid,
+        "title": f"Note {uuid}",
+        "path": os.path.join(str(directory), f"{uuid}.txt"),
+        "created_at": 1.0,
+        "updated_at": updated_at,
+        **extra,
+    }
+
+
+def write_json(directory, notes, age=100):
+    path = os.path.join(directory, "notes.json")
+    with open(path, "w") as f:
+        json.dump(notes, f)
+    # older than anything the stores write during the test
+    past = time.time() - age
+    os.utime(path, (past, past))
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_store_round_trip(tmp_path, backend):
+    store = open_metadata_store(backend, str(tmp_path))
+    assert store.load() == {}
+    store.put(note("a", updated_at=5.0, color="red"))
+    store.put(note("b", updated_at=3.0))
+    store.touch("b", 9.0)
+    assert store.changed_since(4.0) == ["b", "a"]
+    store.delete("b")
+    store.close()
+
+    store = open_metadata_store(backend, str(tmp_path))
+    assert store.load() == {"a": note("a", updated_at=5.0, color="red")}
+    store.close()
+
+
+def test_notes_json_is_imported_and_kept(tmp_path, capsys):
+    write_json(tmp_path, {"a": note("a"), "b": note("b"), "bad": {"uuid": "bad"}})
+    store = SqliteMetadataStore(str(tmp_path))
+    assert sorted(store.load()) == ["a", "b"]
+    store.close()
+    assert "Skipping note" in capsys.readouterr().out
+    assert os.path.exists(tmp_path / "notes.json")
+
+
+def test_unchanged_notes_json_is_not_imported_again(tmp_path, capsys):
+    write_json(tmp_path, {"a": note("a")})
+    store = SqliteMetadataStore(str(tmp_path))
+    store.delete("a")
+    store.put(note("c"))
+    store.close()
+    capsys.readouterr()
+
+    store = SqliteMetadataStore(str(tmp_path))
+    assert sorted(store.load()) == ["c"]
+    store.close()
+    assert "Merged" not in capsys.readouterr().out
+
+
+def test_touched_notes_json_does_not_drop_or_revert_notes(tmp_path):
+    notes = {uuid: note(uuid, directory=tmp_path) for uuid in "abc"}
+    for uuid in notes:
+        (tmp_path / f"{uuid}.txt").write_text(uuid)
+    write_json(tmp_path, {"a": notes["a"], "b": notes["b"]})
+    store = SqliteMetadataStore(str(tmp_path))
+    store.put({**notes["a"], "title": "Renamed", "updated_at": 5.0})
+    store.put(notes["c"])
+    store.close()
+
+    # a sync or backup restore puts the same notes.json back
+    write_json(tmp_path, {"a": notes["a"], "b": notes["b"]}, age=0)
+    store = SqliteMetadataStore(str(tmp_path))
+    loaded = store.load()
+    store.close()
+    assert sorted(loaded) == ["a", "b", "c"]
+    assert loaded["a"]["title"] == "Renamed"
+
+
+def test_switching_backends_keeps_every_change(tmp_path):
+    notes = {uuid: note(uuid, directory=tmp_path) for uuid in "abcd"}
+    for uuid in notes:
+        (tmp_path / f"{uuid}.txt").write_text(uuid)
+    write_json(tmp_path, {"a": notes["a"], "b": notes["b"]})
+    store = SqliteMetadataStore(str(tmp_path))
+    store.put(notes["c"])
+    store.close()
+
+    store = JsonMetadataStore(str(tmp_path))
+    assert sorted(store.load()) == ["a", "b", "c"]
+    # NoteManager.delete_note removes the note file along with the metadata
+    os.remove(tmp_path / "a.txt")
+    store.delete("a")
+    store.put(notes["d"])
+    store.touch("b", 7.0)
+    store.close()
+
+    store = SqliteMetadataStore(str(tmp_path))
+    loaded = store.load()
+    store.close()
+    assert sorted(loaded) == ["b", "c", "d"]
+    assert loaded["b"]["updated_at"] == 7.0
+
+
+def test_malformed_notes_json_is_reported(tmp_path, capsys):
+    write_json(tmp_path, [1, 2])
+    store = SqliteMetadataStore(str(tmp_path))
+    assert store.load() == {}
+    store.close()
+    assert "Error reading notes.json" in capsys.readouterr().out
@@ -0,0 +1,149 @@
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+
+class StubLlamaState:
+    """The fields of llama_cpp.llama.LlamaState the cache reads."""
+
+    def __init__(
+        self, input_ids, scores, n_tokens, llama_state, llama_state_size, seed
+    ):
+        self.input_ids = input_ids
+        self.scores = scores
+        self.n_tokens = n_tokens
+        self.llama_state = llama_state
+        self.llama_state_size = llama_state_size
+        self.seed = seed
+
+
+class StubLlama:
+    @staticmethod
+    def longest_token_prefix(a, b):
+        length = 0
+        for x, y in zip(a, b):
+            if x != y:
+                break
+            length += 1
+        return length
+
+
+class StubLlamaCache:
+    def __init__(self, capacity_bytes):
+        self.capacity_bytes = capacity_bytes
+
+
+try:
+    import llama_cpp  # noqa: F401
+except ImportError:
+    # llama-cpp-python is not built in CI, the cache only needs these from it
+    llama = types.ModuleType("llama_cpp.llama")
+    llama.Llama = StubLlama
+    llama.LlamaState = StubLlamaState
+    llama_cache = types.ModuleType("llama_cpp.llama_cache")
+    llama_cache.BaseLlamaCache = StubLlamaCache
+    sys.modules["llama_cpp"] = types.ModuleType("llama_cpp")
+    sys.modules["llama_cpp.llama"] = llama
+    sys.modules["llama_cpp.llama_cache"] = llama_cache
+
+from llama_cpp.llama import LlamaState
+
+from llm.prefix_cache import MIN_PREFIX_TOKENS, PrefixStateCache, state_size
+
+SYSTEM = list(range(MIN_PREFIX_TOKENS * 2))
+
+
+def make_state(tokens):
+    return LlamaState(
+        np.array(tokens, dtype=np.intc),
+        np.zeros((1, 16), dtype=np.single),
+        len(tokens),
+        b"\0" * 1024,
+        1024,
+        0,
+    )
+
+
+def prompt(template, note):
+    return SYSTEM + [1000 + template] * 8 + [2000 + note] * 8
+
+
+def test_short_prefix_is_a_miss(tmp_path):
+    cache = PrefixStateCache(str(tmp_path), 1 << 20, 0)
+    cache.shared_prefix_tokens = 1
+    cache[SYSTEM] = make_state(SYSTEM)
+    with pytest.raises(KeyError):
+        cache[SYSTEM[: MIN_PREFIX_TOKENS - 1] + [-1]]
+    assert cache.stats()["misses"] == 1
+
+
+def test_longest_prefix_is_returned(tmp_path):
+    cache = PrefixStateCache(str(tmp_path), 1 << 20, 0)
+    cache.shared_prefix_tokens = len(prompt(0, 0))
+    cache[prompt(0, 0)] = make_state(prompt(0, 0))
+    cache[prompt(1, 0)] = make_state(prompt(1, 0))
+    assert list(cache[prompt(1, 5)].input_ids) == prompt(1, 0)
+    assert cache.stats()["hits"] == 1
+
+
+def test_only_one_state_per_shared_prefix_is_kept(tmp_path):
+    cache = PrefixStateCache(str(tmp_path), 1 << 20, 0)
+    cache.shared_prefix_tokens = len(SYSTEM) + 8
+    cache[prompt(0, 0)] = make_state(prompt(0, 0))
+    # a new note with the same template is already covered
+    cache[prompt(0, 1)] = make_state(prompt(0, 1))
+    # a new template is not
+    cache[prompt(1, 1)] = make_state(prompt(1, 1))
+    stats = cache.stats()
+    assert stats["ram_entries"] == 2
+    assert stats["skipped"] == 1
+
+
+def test_memory_tier_evicts_to_disk(tmp_path):
+    size = state_size(make_state(prompt(0, 0)))
+    cache = PrefixStateCache(str(tmp_path), 2 * size, 1 << 20)
+    cache.shared_prefix_tokens = len(prompt(0, 0))
+    for template in range(3):
+        cache[prompt(template, 0)] = make_state(prompt(template, 0))
+        cache.flush()
+    stats = cache.stats()
+    assert stats["ram_entries"] == 2
+    assert stats["disk_entries"] == 3
+    assert list(cache[prompt(0, 1)].input_ids) == prompt(0, 0)
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_disk_tier_evicts_oldest_and_survives_a_restart(tmp_path):
+    cache = PrefixStateCache(str(tmp_path), 1 << 20, 1 << 20)
+    cache.shared_prefix_tokens = len(prompt(0, 0))
+    cache[prompt(0, 0)] = make_state(prompt(0, 0))
+    cache.flush()
+    size = cache.disk_size()
+
+    cache = PrefixStateCache(str(tmp_path), 1 << 20, 2 * size)
+    assert cache.stats()["disk_entries"] == 1
+    cache.shared_prefix_tokens = len(prompt(0, 0))
+    for template in (1, 2):
+        cache[prompt(template, 0)] = make_state(prompt(template, 0))
+        cache.flush()
+    assert cache.stats()["disk_entries"] == 2
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".state")]) == 2
+
+    restarted = PrefixStateCache(str(tmp_path), 1 << 20, 2 * size)
+    assert list(restarted[prompt(2, 1)].input_ids) == prompt(2, 0)
+    assert list(restarted[prompt(0, 1)].input_ids) != prompt(0, 0)
+
+
+def test_without_eviction_states_are_kept_until_an_evicting_cache_opens(tmp_path):
+    worker = PrefixStateCache(str(tmp_path), 1 << 20, 1, evict=False)
+    worker.shared_prefix_tokens = len(prompt(0, 0))
+    for template in range(3):
+        worker[prompt(template, 0)] = make_state(prompt(template, 0))
+        worker.flush()
+    assert worker.stats()["disk_entries"] == 3
+    app = PrefixStateCache(str(tmp_path), 1 << 20, 1)
+    assert app.stats()["disk_entries"] == 0
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from audio.resampler import StreamingResampler
+
+
+def signal(rate, seconds=1.0, channels=1):
+    t = np.arange(int(rate * seconds)) / rate
+    tone = 0.5 * np.sin(2 * np.pi * 440 * t) + 0.2 * np.sin(2 * np.pi * 1234 * t)
+    return np.repeat(tone[:, None], channels, axis=1).astype(np.float32)
+
+
+def resample_in_blocks(audio, input_rate, block_sizes):
+    resampler = StreamingResampler(input_rate, 16000, max(block_sizes))
+    out, start, index = [], 0, 0
+    while start < len(audio):
+        size = block_sizes[index % len(block_sizes)]
+        out.append(resampler.process(audio[start : start + size]).copy())
+        start += size
+        index += 1
+    return np.concatenate(out)
+
+
+@pytest.mark.parametrize("input_rate", [44100, 48000, 22050])
+def test_blocks_match_one_block(input_rate):
+    audio = signal(input_rate)
+    whole = StreamingResampler(input_rate, 16000, len(audio)).process(audio).copy()
+    for block_sizes in ([input_rate // 20], [441, 1000, 7], [input_rate]):
+        blocks = resample_in_blocks(audio, input_rate, block_sizes)
+        assert len(blocks) == len(whole)
+        np.testing.assert_allclose(blocks, whole, atol=1e-5)
+
+
+def test_output_length_follows_the_rate_ratio():
+    audio = signal(48000, seconds=2.0)
+    out = resample_in_blocks(audio, 48000, [2400])
+    assert abs(len(out) - 32000) <= 1
+
+
+def test_stereo_is_mixed_down():
+    mono = signal(48000)
+    stereo = signal(48000, channels=2)
+    resampler = StreamingResampler(48000, 16000, len(mono))
+    expected = resampler.process(mono).copy()
+    resampler.reset()
+    np.testing.assert_allclose(resampler.process(stereo), expected, atol=1e-6)
+
+
+def test_blocks_larger_than_the_buffer_grow_it():
+    audio = signal(44100)
+    resampler = StreamingResampler(44100, 16000, 100)
+    small = resampler.process(audio[:100]).copy()
+    large = resampler.process(audio[100:]).copy()
+    whole = StreamingResampler(44100, 16000, len(audio)).process(audio)
+    np.testing.assert_allclose(np.concatenate([small, large]), whole, atol=1e-5)
@@ -0,0 +1,105 @@
+import json
+import os
+import time
+
+import pytest
+
+from utils import storage
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "get_data_dir", lambda: str(tmp_path))
+    monkeypatch.setattr(storage, "WRITE_DELAY", 0.05)
+    monkeypatch.setattr(storage, "RETRY_DELAY", 0.05)
+    yield tmp_path
+    storage.flush_data()
+
+
+def read(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_stored_values_are_read_back_before_they_are_written(data_dir):
+    storage.store_data("settings.json", "model", "a")
+    assert storage.fetch_data("settings.json", "model") == "a"
+    assert storage.fetch_data("settings.json", "missing", 3) == 3
+    storage.flush_data()
+    assert read(data_dir / "settings.json") == {"model": "a"}
+
+
+def test_changes_close_together_are_written_once(data_dir, monkeypatch):
+    writes = []
+    replace = os.replace
+
+    def counting_replace(source, target):
+        writes.append(target)
+        replace(source, target)
+
+    monkeypatch.setattr(storage.os, "replace", counting_replace)
+    for value in range(10):
+        storage.store_data("settings.json", "value", value)
+    wait_for(lambda: writes)
+    time.sleep(0.1)
+    assert len(writes) == 1
+    assert read(data_dir / "settings.json") == {"value": 9}
+
+
+def test_fetched_values_are_copies(data_dir):
+    storage.store_data("settings.json", "list", [1, 2])
+    storage.fetch_data("settings.json", "list").append(3)
+    assert storage.fetch_data("settings.json", "list") == [1, 2]
+
+
+def test_repeated_fetches_are_served_from_memory(data_dir):
+    storage.store_data("settings.json", "model", "a")
+    storage.flush_data()
+    before = storage.cache_stats()
+    for _ in range(100):
+        storage.fetch_data("settings.json", "model")
+    after = storage.cache_stats()
+    assert after["hits"] - before["hits"] == 100
+    assert after["reloads"] == before["reloads"]
+
+
+def test_changes_made_by_other_processes_are_kept(data_dir):
+    storage.store_data("settings.json", "a", 1)
+    storage.flush_data()
+    (data_dir / "settings.json").write_text(json.dumps({"a": 1, "b": "other"}))
+    storage.store_data("settings.json", "c", 3)
+    storage.flush_data()
+    assert read(data_dir / "settings.json") == {"a": 1, "b": "other", "c": 3}
+
+
+def test_subscribers_hear_about_changes(data_dir, monkeypatch):
+    seen = []
+    path = str(data_dir / "settings.json")
+    monkeypatch.setitem(storage.data_subscribers, path, {"model": [seen.append]})
+    storage.store_data("settings.json", "model", "b")
+    storage.remove_data("settings.json", "model")
+    assert seen == ["b", None]
+
+
+def test_failed_write_is_retried(data_dir, monkeypatch):
+    replace = os.replace
+    failures = [OSError("disk full")]
+
+    def failing_replace(source, target):
+        if failures:
+            raise failures.pop()
+        replace(source, target)
+
+    monkeypatch.setattr(storage.os, "replace", failing_replace)
+    storage.store_data("settings.json", "model", "a")
+    wait_for(lambda: not failures)
+    wait_for(lambda: (data_dir / "settings.json").exists())
+    assert read(data_dir / "settings.json") == {"model": "a"}
+    assert [name for name in os.listdir(data_dir) if name.endswith(".tmp")] == []
@@ -0,0 +1,72 @@
+import os
+
+from llm.summary_cache import SummaryCache, summary_key
+
+SUMMARY = "x" * 100
+
+
+def entry_size(tmp_path):
+    cache = SummaryCache(str(tmp_path / "size"), 1 << 20)
+    cache.put("key", SUMMARY)
+    return cache.size()
+
+
+def test_key_depends_on_every_part():
+    assert summary_key("a", "b") == summary_key("a", "b")
+    assert summary_key("a", "b") != summary_key("ab", "")
+    assert summary_key("a", None) == summary_key("a", "")
+
+
+def test_get_returns_what_was_put(tmp_path):
+    cache = SummaryCache(str(tmp_path), 1 << 20)
+    assert cache.get("key") is None
+    cache.put("key", SUMMARY, seconds=2.5)
+    assert cache.get("key") == SUMMARY
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["seconds_saved"] == 2.5
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    cache = SummaryCache(str(tmp_path), 3 * entry_size(tmp_path))
+    for key in ("a", "b", "c"):
+        cache.put(key, SUMMARY)
+    cache.get("a")
+    cache.put("d", SUMMARY)
+    assert cache.get("b") is None
+    assert all(cache.get(key) == SUMMARY for key in ("a", "c", "d"))
+    assert not os.path.exists(tmp_path / "b.json")
+
+
+def test_index_survives_a_restart(tmp_path):
+    SummaryCache(str(tmp_path), 1 << 20).put("key", SUMMARY)
+    assert SummaryCache(str(tmp_path), 1 << 20).get("key") == SUMMARY
+
+
+def test_without_eviction_entries_are_kept_until_an_evicting_cache_opens(tmp_path):
+    size = entry_size(tmp_path)
+    directory = str(tmp_path / "shared")
+    worker = SummaryCache(directory, 2 * size, evict=False)
+    for key in ("a", "b", "c", "d"):
+        worker.put(key, SUMMARY)
+        os.utime(os.path.join(directory, key + ".json"), (len(key), ord(key)))
+    assert len(os.listdir(directory)) == 4
+    app = SummaryCache(directory, 2 * size)
+    assert app.stats()["entries"] == 2
+    assert app.get("a") is None and app.get("d") == SUMMARY
+
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = SummaryCache(str(tmp_path), 1 << 20)
+    cache.put("key", SUMMARY)
+    (tmp_path / "key.json").write_text("not json")
+    assert cache.get("key") is None
+    assert not os.path.exists(tmp_path / "key.json")
+
+
+def test_zero_capacity_disables_the_cache(tmp_path):
+    directory = tmp_path / "off"
+    cache = SummaryCache(str(directory), 0)
+    cache.put("key", SUMMARY)
+    assert cache.get("key") is None
+    assert not directory.exists()